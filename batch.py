@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import contextlib
+import io
+import json
+import os
+import time
+from typing import List
+
+from enums import CardSize, ImageFormat, PaperSize, PdfEngine, RenderPreset
+from pydantic import BaseModel, ValidationError
+from utilities import delete_hidden_files_in_directory, generate_pdf, get_back_card_image_files, get_image_file_paths, shared_tiles
+
+class BatchJob(BaseModel):
+    front_dir_path: str
+    back_dir_path: str
+    double_sided_dir_path: str
+    output_path: str
+    output_images: bool = False
+    image_format: ImageFormat = ImageFormat.PNG
+    compress_level: int = 6
+    card_size: CardSize = CardSize.STANDARD
+    paper_size: PaperSize = PaperSize.LETTER
+    only_fronts: bool = False
+    crop: str | None = None
+    extend_corners: int = 0
+    ppi: int = 300
+    quality: int = 75
+    skip: List[int] = []
+    load_offset: bool = False
+    name: str | None = None
+    engine: PdfEngine = PdfEngine.RASTER
+    preset: RenderPreset = RenderPreset.PRINT
+
+def load_batch_jobs(job_path: str) -> List[BatchJob]:
+    with open(job_path, 'r') as job_file:
+        try:
+            job_data = json.load(job_file)
+            return [BatchJob(**job) for job in job_data]
+
+        except (json.JSONDecodeError, TypeError, ValidationError) as e:
+            raise Exception(f'Cannot parse job file "{job_path}": {e}.')
+
+def estimate_batch_job_cost(job: BatchJob) -> float:
+    # Rendering time mostly grows with the number of cards and the pixels of each card
+    num_images = 0
+    for dir_path in [job.front_dir_path, job.double_sided_dir_path]:
+        if os.path.isdir(dir_path):
+            num_images += len(get_image_file_paths(dir_path))
+
+    return num_images * (job.ppi / 300) ** 2
+
+def render_batch_job(job: BatchJob, jobs: int, cache_size: int, output_cache_size: int = 0) -> tuple[str, float, str | None]:
+    """
+    Renders one job of a batch and returns its output, its duration and the
+    error that stopped it, if any. The output is collected rather than
+    printed so that jobs running at the same time don't interleave.
+    """
+    log = io.StringIO()
+    start = time.perf_counter()
+    error = None
+
+    try:
+        # Nobody is around to pick one of several back images
+        if not job.only_fronts and os.path.isdir(job.back_dir_path):
+            delete_hidden_files_in_directory(job.back_dir_path)
+
+            num_back_images = len(get_back_card_image_files(job.back_dir_path))
+            if num_back_images > 1:
+                raise Exception(f'Back image directory "{job.back_dir_path}" has {num_back_images} images. Batch jobs can only have one back image.')
+
+        with contextlib.redirect_stdout(log):
+            generate_pdf(
+                job.front_dir_path,
+                job.back_dir_path,
+                job.double_sided_dir_path,
+                job.output_path,
+                job.output_images,
+                job.card_size.value,
+                job.paper_size.value,
+                job.only_fronts,
+                job.crop,
+                job.extend_corners,
+                job.ppi,
+                job.quality,
+                job.skip,
+                job.load_offset,
+                job.name,
+                jobs,
+                cache_size,
+                job.engine,
+                job.image_format,
+                job.compress_level,
+                job.preset,
+                output_cache_size=output_cache_size
+            )
+
+    except Exception as e:
+        error = str(e)
+
+    # Tiles are only shared within a deck, the worker goes on to render other decks
+    shared_tiles.clear()
+
+    return log.getvalue(), time.perf_counter() - start, error
+
+def generate_batch(batch_jobs: List[BatchJob], jobs: int, cache_size: int = 0, output_cache_size: int = 0):
+    """
+    Renders several decks. Each worker process renders one deck at a time
+    and keeps the layouts, fonts and the most recent registration images
+    it has loaded for the decks that follow. The decks expected to take the
+    longest are started first so that no worker is left with a large deck
+    at the end. When there are fewer decks than jobs, the spare jobs
+    compose the sheets of each deck in parallel.
+    """
+    if len(batch_jobs) == 0:
+        print('No jobs were found')
+        return
+
+    num_workers = min(jobs, len(batch_jobs))
+    sheet_jobs = max(1, jobs // len(batch_jobs))
+
+    costs = [estimate_batch_job_cost(job) for job in batch_jobs]
+    order = sorted(range(len(batch_jobs)), key=lambda index: -costs[index])
+
+    failed_jobs = []
+    num_done = 0
+
+    def report(index: int, log: str, duration: float, error: str | None):
+        nonlocal num_done
+        num_done += 1
+
+        job = batch_jobs[index]
+        print(log, end='')
+        if error is None:
+            print(f'[{num_done}/{len(batch_jobs)}] Finished job {index + 1}: {job.output_path} in {duration:.1f}s')
+        else:
+            print(f'[{num_done}/{len(batch_jobs)}] Failed job {index + 1}: {job.output_path}: {error}')
+            failed_jobs.append(index + 1)
+
+    if num_workers <= 1:
+        for index in order:
+            report(index, *render_batch_job(batch_jobs[index], sheet_jobs, cache_size, output_cache_size))
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(render_batch_job, batch_jobs[index], sheet_jobs, cache_size, output_cache_size): index for index in order}
+
+            for future in as_completed(futures):
+                report(futures[future], *future.result())
+
+    if len(failed_jobs) > 0:
+        raise Exception(f'{len(failed_jobs)} of {len(batch_jobs)} jobs failed: {failed_jobs}.')
+
+    print(f'Finished {len(batch_jobs)} job{"s" if len(batch_jobs) != 1 else ""}')
@@ -0,0 +1,22 @@
+import os
+
+import click
+
+@click.command()
+@click.option("--job_path", required=True, help="The path to the JSON job file listing the decks to create.")
+@click.option("--jobs", type=click.IntRange(min=1), help="Number of processes used to create decks in parallel. Defaults to the number of CPUs.")
+@click.option("--cache_size", default=0, type=click.IntRange(min=0), show_default=True, help="Maximum size in MB of the cache of processed card images and sheet templates, reused across runs. Use 0 to disable the cache.")
+@click.option("--output_cache_size", default=0, type=click.IntRange(min=0), show_default=True, help="Maximum size in MB of the cache of finished PDFs and images, copied as is when the same deck is created again with the same options. Use 0 to disable the cache.")
+@click.version_option("1.3.0")
+
+def cli(job_path, jobs, cache_size, output_cache_size):
+    # Imported here so that --help and invalid options don't wait for the image libraries
+    from batch import generate_batch, load_batch_jobs
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    generate_batch(load_batch_jobs(job_path), jobs, cache_size, output_cache_size)
+
+if __name__ == '__main__':
+    cli()
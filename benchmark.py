@@ -0,0 +1,345 @@
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+from enums import CardSize, PaperSize, PdfEngine, RenderPreset
+
+output_directory = os.path.join('game', 'output')
+
+default_output_path = os.path.join(output_directory, 'benchmark.json')
+
+image_formats = ['png', 'jpg', 'webp']
+
+def parse_double_sided(value: str) -> bool:
+    return value.lower() in ('true', 'yes', '1')
+
+def get_peak_rss_mb() -> tuple[float | None, float | None]:
+    """
+    Returns the peak resident set size in MB of this process and of its
+    largest finished child process.
+    """
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None, None
+
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    unit = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / (1024 * 1024)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / (1024 * 1024)
+
+    return round(own, 1), round(children, 1)
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def create_deck(
+    deck_path: str,
+    card_size: CardSize,
+    num_cards: int,
+    image_ppi: int,
+    formats: list[str],
+    double_sided: bool
+):
+    """
+    Creates synthetic card images for a deck. Formats are cycled through the
+    cards and every third card is stored rotated with an EXIF orientation tag,
+    like photos taken with a phone.
+    """
+    from PIL import Image, ImageDraw
+    from utilities import load_layouts
+
+    card_layout = load_layouts().card_sizes[card_size]
+    width = max(round(card_layout.width * image_ppi / 300), 1)
+    height = max(round(card_layout.height * image_ppi / 300), 1)
+
+    front_path = os.path.join(deck_path, 'front')
+    back_path = os.path.join(deck_path, 'back')
+    double_sided_path = os.path.join(deck_path, 'double_sided')
+    for path in [front_path, back_path, double_sided_path]:
+        os.makedirs(path, exist_ok=True)
+
+    def create_card_image(index: int, color: tuple[int, int, int]) -> Image.Image:
+        # Noise keeps the images from compressing unrealistically well
+        noise = Image.effect_noise((width, height), 40)
+        card_image = Image.merge('RGB', [noise.point(lambda value, c=c: (value + c) // 2) for c in color])
+
+        draw = ImageDraw.Draw(card_image)
+        draw.rectangle([width // 10, height // 10, width - width // 10, height // 2], fill=(255, 255, 255))
+        draw.text((width // 8, height // 8), f'Card {index}', fill=(0, 0, 0), font_size=max(height // 20, 1))
+
+        return card_image
+
+    # The rotation that undoes each EXIF orientation, and the mix of orientations in a deck
+    rotations = {3: Image.Transpose.ROTATE_180, 6: Image.Transpose.ROTATE_90, 8: Image.Transpose.ROTATE_270}
+    orientations = [1, 1, 6, 1, 1, 3, 1, 1, 8]
+
+    def save_card_image(card_image: Image.Image, path: str, image_format: str, orientation: int):
+        exif = Image.Exif()
+        if orientation != 1:
+            # Store the pixels so that the EXIF orientation turns them upright again
+            exif[0x0112] = orientation
+            card_image = card_image.transpose(rotations[orientation])
+
+        save_format = {'png': 'PNG', 'jpg': 'JPEG', 'webp': 'WEBP'}[image_format]
+        card_image.save(path, save_format, exif=exif)
+
+    for index in range(num_cards):
+        image_format = formats[index % len(formats)]
+        orientation = orientations[index % len(orientations)]
+        color = ((index * 67) % 256, (index * 131) % 256, (index * 197) % 256)
+
+        save_card_image(create_card_image(index, color), os.path.join(front_path, f'card{index}.{image_format}'), image_format, orientation)
+
+        # Half of the cards get a unique back
+        if double_sided and index % 2 == 0:
+            save_card_image(create_card_image(index, color[::-1]), os.path.join(double_sided_path, f'card{index}.{image_format}'), image_format, orientation)
+
+    create_card_image(-1, (40, 40, 120)).save(os.path.join(back_path, 'back.png'))
+
+def create_workspace(workspace_path: str):
+    """
+    Creates an empty working directory for a run, with a copy of the assets.
+    Caches, scan manifests and ingested images are kept relative to the
+    working directory, so a run in it can't use anything a previous run or
+    ingest.py left behind.
+    """
+    shutil.rmtree(workspace_path, ignore_errors=True)
+    shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets'), os.path.join(workspace_path, 'assets'))
+
+def run_case(case: dict, deck_path: str, output_path: str, workspace_path: str) -> dict:
+    """
+    Renders one benchmark case in workspace_path. Runs in a fresh process
+    so that in-process caches and the peak RSS don't carry over between
+    cases.
+    """
+    os.chdir(workspace_path)
+
+    from utilities import generate_pdf, get_manifest_path
+
+    # Start from scratch, so that sheets of the previous run are not reused
+    for path in [output_path, get_manifest_path(output_path, False)]:
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        generate_pdf(
+            os.path.join(deck_path, 'front'),
+            os.path.join(deck_path, 'back'),
+            os.path.join(deck_path, 'double_sided'),
+            output_path,
+            False,
+            case['card_size'],
+            case['paper_size'],
+            False,
+            case['crop'],
+            case['extend_corners'],
+            case['ppi'],
+            case['quality'],
+            [],
+            False,
+            None,
+            case['jobs'],
+            case['cache_size'],
+            case['engine'],
+            preset=case['preset']
+        )
+    wall_time = time.perf_counter() - start
+
+    peak_rss_mb, peak_child_rss_mb = get_peak_rss_mb()
+
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(output_path)
+    num_pages = len(pdf)
+    pdf.close()
+
+    return {
+        'wall_time': wall_time,
+        'pages': num_pages,
+        'output_size': os.path.getsize(output_path),
+        'peak_rss_mb': peak_rss_mb,
+        'peak_child_rss_mb': peak_child_rss_mb
+    }
+
+def get_case_key(case: dict) -> str:
+    return json.dumps(case, sort_keys=True)
+
+@click.command()
+@click.option("--output_path", default=default_output_path, show_default=True, help="The desired path to the JSON results.")
+@click.option("--baseline_path", help="The path to previous JSON results to compare against.")
+@click.option("--card_size", type=click.Choice([t.value for t in CardSize], case_sensitive=False), multiple=True, help="Card sizes to benchmark. Defaults to all of them.")
+@click.option("--paper_size", type=click.Choice([t.value for t in PaperSize], case_sensitive=False), multiple=True, help="Paper sizes to benchmark. Defaults to all of them.")
+@click.option("--num_cards", default=36, type=click.IntRange(min=1), show_default=True, help="Number of cards in each synthetic deck.")
+@click.option("--image_ppi", default=300, type=click.IntRange(min=1), show_default=True, help="Resolution of the synthetic card images.")
+@click.option("--format", "formats", type=click.Choice(image_formats, case_sensitive=False), multiple=True, help="Image formats used in the synthetic decks. Defaults to all of them.")
+@click.option("--ppi", default=[300], type=click.IntRange(min=1), multiple=True, show_default=True, help="PPI values to benchmark.")
+@click.option("--crop", default=[''], multiple=True, help="Crop values to benchmark. Examples: 3mm, 0.125in, 6.5.")
+@click.option("--extend_corners", default=[0], type=click.IntRange(min=0), multiple=True, show_default=True, help="Extend corners values to benchmark.")
+@click.option("--double_sided", default=['false'], type=click.Choice(['true', 'false'], case_sensitive=False), multiple=True, show_default=True, help="Whether half of the cards have a double-sided back.")
+@click.option("--quality", default=75, type=click.IntRange(min=0, max=100), show_default=True, help="File compression passed to create_pdf.py.")
+@click.option("--jobs", default=1, type=click.IntRange(min=1), show_default=True, help="Number of processes passed to create_pdf.py.")
+@click.option("--cache_size", default=0, type=click.IntRange(min=0), show_default=True, help="Cache size in MB passed to create_pdf.py. Every run starts with an empty cache, so this measures the cost of filling it.")
+@click.option("--engine", default=PdfEngine.RASTER.value, type=click.Choice([t.value for t in PdfEngine], case_sensitive=False), show_default=True, help="PDF engine passed to create_pdf.py.")
+@click.option("--preset", default=RenderPreset.PRINT.value, type=click.Choice([t.value for t in RenderPreset], case_sensitive=False), show_default=True, help="Render preset passed to create_pdf.py.")
+@click.option("--repeat", default=1, type=click.IntRange(min=1), show_default=True, help="Number of runs of each case. The fastest run is reported.")
+
+def cli(
+    output_path,
+    baseline_path,
+    card_size,
+    paper_size,
+    num_cards,
+    image_ppi,
+    formats,
+    ppi,
+    crop,
+    extend_corners,
+    double_sided,
+    quality,
+    jobs,
+    cache_size,
+    engine,
+    preset,
+    repeat
+):
+    from utilities import load_layouts
+
+    layouts = load_layouts()
+    card_sizes = [CardSize(size) for size in card_size] or list(CardSize)
+    paper_sizes = [PaperSize(size) for size in paper_size] or list(PaperSize)
+    formats = list(formats) or image_formats
+
+    # Only some card sizes fit on each paper size
+    size_pairs = [
+        (card, paper)
+        for card, paper in itertools.product(card_sizes, paper_sizes)
+        if card.value in layouts.paper_layouts[paper].card_layouts
+    ]
+    if len(size_pairs) == 0:
+        raise click.BadParameter('None of the selected card sizes are supported by the selected paper sizes.')
+
+    baseline = {}
+    if baseline_path is not None:
+        with open(baseline_path, 'r') as baseline_file:
+            baseline = {get_case_key(result['case']): result for result in json.load(baseline_file)['results']}
+
+    results = []
+    work_path = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        for (card, paper), case_ppi, case_crop, case_extend_corners, case_double_sided in itertools.product(
+            size_pairs, ppi, crop, extend_corners, [parse_double_sided(value) for value in double_sided]
+        ):
+            case = {
+                'card_size': card.value,
+                'paper_size': paper.value,
+                'num_cards': num_cards,
+                'image_ppi': image_ppi,
+                'formats': formats,
+                'ppi': case_ppi,
+                'crop': case_crop or None,
+                'extend_corners': case_extend_corners,
+                'double_sided': case_double_sided,
+                'quality': quality,
+                'jobs': jobs,
+                'cache_size': cache_size,
+                'engine': engine,
+                'preset': preset
+            }
+
+            deck_path = os.path.join(work_path, f'{card.value}_{"double_sided" if case_double_sided else "single_sided"}')
+            if not os.path.exists(deck_path):
+                create_deck(deck_path, card, num_cards, image_ppi, formats, case_double_sided)
+
+            runs = []
+            for _ in range(repeat):
+                # A new process and an empty workspace for each run, so every run starts cold
+                workspace_path = os.path.join(work_path, 'workspace')
+                create_workspace(workspace_path)
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    runs.append(executor.submit(run_case, case, deck_path, os.path.join(work_path, 'output.pdf'), workspace_path).result())
+
+            best = min(runs, key=lambda run: run['wall_time'])
+            sheets = best['pages'] // 2
+            result = {
+                'case': case,
+                'wall_time': round(best['wall_time'], 4),
+                'wall_times': [round(run['wall_time'], 4) for run in runs],
+                'median_wall_time': round(statistics.median(run['wall_time'] for run in runs), 4),
+                'pages': best['pages'],
+                'sheets': sheets,
+                'sheets_per_second': round(sheets / best['wall_time'], 4),
+                'seconds_per_sheet': round(best['wall_time'] / sheets, 4) if sheets > 0 else None,
+                'output_size': best['output_size'],
+                'peak_rss_mb': max((run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None), default=None),
+                'peak_child_rss_mb': max((run['peak_child_rss_mb'] for run in runs if run['peak_child_rss_mb'] is not None), default=None)
+            }
+
+            summary = (
+                f'{card.value} on {paper.value}, ppi {case_ppi}, crop {case_crop or "none"}, '
+                f'extend corners {case_extend_corners}, {"double-sided" if case_double_sided else "single-sided"}: '
+                f'{result["wall_time"]:.2f}s, {result["sheets_per_second"]:.2f} sheets/s, '
+                f'peak RSS {result["peak_rss_mb"]} MB'
+            )
+
+            baseline_result = baseline.get(get_case_key(case))
+            if baseline_result is not None:
+                result['baseline_wall_time'] = baseline_result['wall_time']
+                result['speedup'] = round(baseline_result['wall_time'] / best['wall_time'], 3)
+                summary += f', {result["speedup"]:.2f}x baseline'
+
+            print(summary)
+            results.append(result)
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    import PIL
+    import pydantic
+    import pypdfium2
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'commit': get_git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pillow': PIL.__version__,
+            'pydantic': pydantic.__version__,
+            'pypdfium2': pypdfium2.V_PYPDFIUM2
+        },
+        'results': results
+    }
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir != '':
+        os.makedirs(output_dir, exist_ok=True)
+
+    with open(output_path, 'w') as output_file:
+        json.dump(report, output_file, indent=4)
+
+    print(f'Generated benchmark results: {output_path}')
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,326 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List
+
+from enums import RenderPreset
+from PIL import Image, PngImagePlugin
+from pydantic import BaseModel, ValidationError
+
+# Specify directory locations
+cache_directory = os.path.join('data', 'cache')
+image_cache_directory = os.path.join(cache_directory, 'images')
+output_cache_directory = os.path.join(cache_directory, 'outputs')
+
+# Tiles made by ingest.py, kept apart from the cache so they're never pruned
+ingest_directory = os.path.join('data', 'ingest')
+
+# Bump these when the way tiles or templates are drawn changes, so stale cached images are not reused
+tile_cache_version = 3
+template_cache_version = 1
+
+def hash_file(path: str) -> str:
+    # Files are only read again when they have been modified
+    stat = os.stat(path)
+    return hash_file_contents(path, stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=65536)
+def hash_file_contents(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def get_cache_key(*params) -> str:
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+class ImageCache:
+    """
+    Persistent on-disk cache of processed images, such as card tiles and
+    sheet templates, keyed by get_cache_key. Once the cache grows past
+    max_size bytes, the least recently used images are deleted.
+    """
+
+    def __init__(self, cache_dir: str = image_cache_directory, max_size: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    # Caches with the same settings are interchangeable, even across processes
+    def __eq__(self, other):
+        return isinstance(other, ImageCache) and (self.cache_dir, self.max_size) == (other.cache_dir, other.max_size)
+
+    def __hash__(self):
+        return hash((self.cache_dir, self.max_size))
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.png')
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._get_path(key))
+
+    def get(self, key: str) -> Image.Image | None:
+        path = self._get_path(key)
+
+        try:
+            with Image.open(path) as image:
+                image.load()
+
+            # Mark the image as recently used
+            os.utime(path)
+            return image
+
+        except OSError:
+            return None
+
+    def put(self, key: str, image: Image.Image):
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so that other processes never read a partial image
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        image.save(temp_path, format='PNG', compress_level=1)
+        os.replace(temp_path, path)
+
+    def prune(self):
+        images = []
+        for current_folder, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                full_path = os.path.join(current_folder, filename)
+                try:
+                    stat = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+
+                images.append((stat.st_mtime, stat.st_size, full_path))
+
+        total_size = sum(size for _, size, _ in images)
+
+        # Delete the least recently used images first
+        for _, size, full_path in sorted(images):
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.remove(full_path)
+            except FileNotFoundError:
+                pass
+
+            total_size -= size
+
+class IngestStore:
+    """
+    On-disk store of the card tiles made by ingest.py. A tile is keyed by
+    the path of its card image and the options it's drawn with, and records
+    the modification time and size of the image it was made from, so a
+    tile is only used while its image is unchanged.
+
+    Unlike ImageCache, the store has no size limit and nothing is ever
+    deleted from it, so renders can rely on the tiles whatever their cache
+    settings.
+    """
+
+    def __init__(self, store_dir: str = ingest_directory):
+        self.store_dir = store_dir
+
+    def _get_path(self, image_path: str, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset) -> str:
+        # The crop is given as floats by ingest.py and sometimes as integers by renders
+        crop = tuple(float(value) for value in crop)
+        key = get_cache_key('ingest', tile_cache_version, os.path.abspath(image_path), width, height, crop, ppi_ratio, extend_corners, flip, preset)
+        return os.path.join(self.store_dir, key[:2], f'{key}.png')
+
+    @staticmethod
+    def get_source(image_path: str) -> str:
+        # Identifies the version of the card image a tile is made from
+        stat = os.stat(image_path)
+        return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+    def _open(self, image_path: str, *tile_options) -> Image.Image | None:
+        try:
+            source = self.get_source(image_path)
+            image = Image.open(self._get_path(image_path, *tile_options))
+        except OSError:
+            return None
+
+        # Text chunks come before the pixels, so a stale tile is never decoded
+        if image.info.get('source') != source:
+            image.close()
+            return None
+
+        return image
+
+    def has(self, image_path: str, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset) -> bool:
+        image = self._open(image_path, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+        if image is None:
+            return False
+
+        image.close()
+        return True
+
+    def get(self, image_path: str, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset) -> Image.Image | None:
+        image = self._open(image_path, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+        if image is None:
+            return None
+
+        try:
+            with image:
+                image.load()
+        except OSError:
+            return None
+
+        return image
+
+    def put(self, image_path: str, source: str, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset, card_tile: Image.Image):
+        path = self._get_path(image_path, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        png_info = PngImagePlugin.PngInfo()
+        png_info.add_text('source', source)
+
+        # Write to a temporary file first so that renders never read a partial tile
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        card_tile.save(temp_path, format='PNG', compress_level=1, pnginfo=png_info)
+        os.replace(temp_path, path)
+
+def get_file_stat(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime_ns
+
+def copy_file(source_path: str, destination_path: str, link: bool = False):
+    """
+    Copies a file, replacing the destination in one step. With link, the
+    file is hardlinked where possible, which is instant and takes no space,
+    but the destination then shares its contents with the source.
+    """
+    temp_path = f'{destination_path}.{os.getpid()}.tmp'
+
+    if link:
+        try:
+            os.link(source_path, temp_path)
+        except OSError:
+            # Hardlinks only work within the same drive
+            link = False
+
+    if not link:
+        shutil.copyfile(source_path, temp_path)
+
+    os.replace(temp_path, destination_path)
+
+class OutputCacheEntry(BaseModel):
+    # Key of every page of the output
+    pages: List[str]
+
+    # Size and modification time of the cached files, to tell whether they were modified in place
+    files: Dict[str, tuple[int, int]]
+
+class OutputCache:
+    """
+    Persistent on-disk cache of finished renders, keyed by get_cache_key of
+    everything that affects the output. Outputs are hardlinked into the
+    cache where possible, so keeping a render costs no space until its
+    output is replaced, and copied out of it, so that every output can be
+    edited on its own. Once the cache grows past max_size bytes, the least
+    recently used renders are deleted.
+    """
+
+    entry_filename = 'entry.json'
+
+    def __init__(self, cache_dir: str = output_cache_directory, max_size: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, key: str, output_path: str, output_images: bool) -> List[str] | None:
+        """
+        Copies the render with key to output_path, and returns the
+        keys of its pages. Returns None when there is no such render.
+        """
+        path = self._get_path(key)
+        entry_path = os.path.join(path, self.entry_filename)
+
+        try:
+            with open(entry_path, 'r') as entry_file:
+                entry = OutputCacheEntry(**json.load(entry_file))
+        except (OSError, json.JSONDecodeError, ValidationError):
+            return None
+
+        # An output that shares its files with the cache may have been edited in place
+        if any(get_file_stat(os.path.join(path, filename)) != tuple(stat) for filename, stat in entry.files.items()):
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        if output_images:
+            os.makedirs(output_path, exist_ok=True)
+
+        try:
+            for filename in entry.files:
+                copy_file(os.path.join(path, filename), os.path.join(output_path, filename) if output_images else output_path)
+        except OSError:
+            # Another process deleted the render while it was being restored
+            return None
+
+        # Mark the render as recently used
+        os.utime(entry_path)
+        return entry.pages
+
+    def store(self, key: str, page_keys: List[str], file_paths: List[str]):
+        path = self._get_path(key)
+        if os.path.exists(path):
+            return
+
+        # Fill a temporary directory first so that other processes never restore a partial render
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        files = {}
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
+            copy_file(file_path, os.path.join(temp_path, filename), link=True)
+            files[filename] = get_file_stat(os.path.join(temp_path, filename))
+
+        with open(os.path.join(temp_path, self.entry_filename), 'w') as entry_file:
+            entry_file.write(OutputCacheEntry(pages=page_keys, files=files).model_dump_json(indent=4))
+
+        try:
+            os.replace(temp_path, path)
+        except OSError:
+            # Another process stored the same render first
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    def prune(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        # Every render is a folder of files, in a folder named after the start of its key
+        renders = []
+        for key_prefix in os.listdir(self.cache_dir):
+            for key in os.listdir(os.path.join(self.cache_dir, key_prefix)):
+                path = os.path.join(self.cache_dir, key_prefix, key)
+                try:
+                    last_used = os.stat(os.path.join(path, self.entry_filename)).st_mtime
+                    size = sum(entry.stat().st_size for entry in os.scandir(path))
+                except OSError:
+                    # Renders that are still being stored have no entry yet
+                    continue
+
+                renders.append((last_used, size, path))
+
+        total_size = sum(size for _, size, _ in renders)
+
+        # Delete the least recently used renders first
+        for _, size, path in sorted(renders):
+            if total_size <= self.max_size:
+                break
+
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
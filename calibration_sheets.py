@@ -0,0 +1,198 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import math
+import os
+from typing import Iterable, List
+
+from caches import get_cache_key, get_file_stat, hash_file
+from enums import PaperSize, PdfEngine
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from pydantic import BaseModel
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from utilities import PageManifest, asset_directory, get_manifest_path, insert_pdf_text, load_page_manifest
+
+# Bump this when the way calibration sheets are drawn changes, so older sheets are built again
+calibration_version = 1
+
+# Size of and distance between the squares of the calibration grid, in pixels at 300 PPI
+calibration_square_size = 25
+calibration_square_distance = 75
+
+class CalibrationSquare(BaseModel):
+    # Top left corners of the square on the front and the back page, in pixels at 300 PPI
+    front_position: tuple[float, float]
+    back_position: tuple[float, float]
+
+    # The offset that lines up the back square with the front square
+    offset: tuple[int, int]
+
+    # The middle row and column are blue
+    fill: str
+
+def get_calibration_squares(page_width: int, page_height: int) -> List[CalibrationSquare]:
+    """
+    Lays out the calibration grid. Each back square is moved by its offset
+    from the front square, so the squares that line up once printed give
+    the offset of the printer.
+    """
+    square_size = calibration_square_size
+    square_distance = calibration_square_distance
+
+    matrix_size_x = math.floor(page_width / (square_size + square_distance)) - 6
+    matrix_half_size_x = math.floor(matrix_size_x / 2)
+
+    matrix_size_y = math.floor(page_height / (square_size + square_distance)) - 6
+    matrix_half_size_y = math.floor(matrix_size_y / 2)
+
+    if matrix_size_x % 2 > 0:
+        start_x = math.floor(page_width / 2) - (matrix_half_size_x * square_distance) - ((matrix_half_size_x + .5) * square_size)
+    else:
+        if matrix_size_x <= 0:
+            raise Exception(f'matrix_size must be greater than 0; received: {matrix_size_x}')
+        start_x = math.floor(page_width / 2) - ((matrix_half_size_x - .5) * square_distance) - (matrix_half_size_x * square_size)
+
+    if matrix_size_y % 2 > 0:
+        start_y = math.floor(page_height / 2) - (matrix_half_size_y * square_distance) - ((matrix_half_size_y + .5) * square_size)
+    else:
+        if matrix_size_y <= 0:
+            raise Exception(f'matrix_size must be greater than 0; received: {matrix_size_y}')
+        start_y = math.floor(page_height / 2) - ((matrix_half_size_y - .5) * square_distance) - (matrix_half_size_y * square_size)
+
+    squares = []
+    for x_index in range(matrix_size_x):
+        for y_index in range(matrix_size_y):
+            front_x = start_x + x_index * (square_distance + square_size)
+            front_y = start_y + y_index * (square_distance + square_size)
+            offset = (x_index - matrix_half_size_x, y_index - matrix_half_size_y)
+
+            squares.append(CalibrationSquare(
+                front_position=(front_x, front_y),
+                back_position=(front_x + offset[0], front_y + offset[1]),
+                offset=offset,
+                fill='blue' if x_index == matrix_half_size_x or y_index == matrix_half_size_y else 'black'
+            ))
+
+    return squares
+
+def get_calibration_page_size(blank_path: str) -> tuple[int, int]:
+    # Calibration sheets are always landscape
+    with Image.open(blank_path) as blank_image:
+        return max(blank_image.size), min(blank_image.size)
+
+def save_raster_calibration_pdf(blank_path: str, pdf_path: str):
+    with Image.open(blank_path) as blank_image:
+        if blank_image.height > blank_image.width:
+            blank_image = blank_image.rotate(90, expand=True)
+
+        front_image = blank_image.copy()
+        back_image = blank_image.copy()
+
+    font = ImageFont.truetype(os.path.join(asset_directory, 'arial.ttf'), 40)
+    coord_font = ImageFont.truetype(os.path.join(asset_directory, 'arial.ttf'), 25)
+
+    front_draw = ImageDraw.Draw(front_image)
+    back_draw = ImageDraw.Draw(back_image)
+
+    page_width, page_height = front_image.size
+    front_draw.text((page_width - 180, page_height - 180), 'front', fill=(0, 0, 0), anchor='ra', font=font)
+    back_draw.text((page_width - 180, page_height - 180), 'back', fill=(0, 0, 0), anchor='ra', font=font)
+
+    square_size = calibration_square_size
+    for square in get_calibration_squares(page_width, page_height):
+        front_x, front_y = square.front_position
+        front_draw.rectangle([(front_x, front_y), (front_x + square_size, front_y + square_size)], fill=square.fill)
+
+        back_x, back_y = square.back_position
+        back_draw.rectangle([(back_x, back_y), (back_x + square_size, back_y + square_size)], fill=square.fill)
+        back_draw.text((back_x + math.floor(square_size / 2), back_y + math.floor(square_size / 2) + 30), f'({square.offset[0]}, {square.offset[1]})', fill='red', anchor='mm', font=coord_font)
+
+    front_image.save(pdf_path, format='PDF', save_all=True, append_images=[back_image], resolution=300, speed=0, subsampling=0, quality=100)
+
+def save_direct_calibration_pdf(blank_path: str, pdf_path: str):
+    # Only the size of the blank page is used, the grid is drawn as vector shapes
+    page_width, page_height = get_calibration_page_size(blank_path)
+    points_per_pixel = 72 / 300
+
+    pdf = pdfium.PdfDocument.new()
+    square_size = calibration_square_size
+
+    for side in ('front', 'back'):
+        page = pdf.new_page(page_width * points_per_pixel, page_height * points_per_pixel)
+        insert_pdf_text(pdf, page, side, 40 * points_per_pixel, (page_width - 180) * points_per_pixel, 180 * points_per_pixel, 'ra')
+
+        for square in get_calibration_squares(page_width, page_height):
+            x, y = square.front_position if side == 'front' else square.back_position
+
+            # Pillow fills both corners of a rectangle, so raster squares are one pixel larger
+            rect = pdfium_c.FPDFPageObj_CreateNewRect(
+                x * points_per_pixel,
+                (page_height - y - square_size - 1) * points_per_pixel,
+                (square_size + 1) * points_per_pixel,
+                (square_size + 1) * points_per_pixel
+            )
+            pdfium_c.FPDFPageObj_SetFillColor(rect, *ImageColor.getrgb(square.fill), 255)
+            pdfium_c.FPDFPath_SetDrawMode(rect, pdfium_c.FPDF_FILLMODE_WINDING, False)
+            pdfium_c.FPDFPage_InsertObject(page, rect)
+
+            if side == 'back':
+                center_x = x + math.floor(square_size / 2)
+                center_y = y + math.floor(square_size / 2) + 30
+                insert_pdf_text(pdf, page, f'({square.offset[0]}, {square.offset[1]})', 25 * points_per_pixel, center_x * points_per_pixel, (page_height - center_y) * points_per_pixel, 'mm', fill='red')
+
+        page.gen_content()
+        page.close()
+
+    try:
+        pdf.save(pdf_path)
+    finally:
+        pdf.close()
+
+def generate_calibration_pdf(paper_size: PaperSize, output_dir: str, engine: PdfEngine = PdfEngine.DIRECT) -> tuple[str, bool]:
+    """
+    Builds the calibration sheet of a paper size. The sheet is only built
+    again when the blank page, the font or the way it is drawn changed, or
+    when the existing sheet was modified. Returns the path of the sheet and
+    whether it was built.
+    """
+    blank_path = os.path.join(asset_directory, f'{paper_size.value}_blank.jpg')
+    pdf_path = os.path.join(output_dir, f'{paper_size.value}_calibration.pdf')
+    manifest_path = get_manifest_path(pdf_path, False)
+
+    # The direct engine uses a standard PDF font rather than the font file
+    font_hash = hash_file(os.path.join(asset_directory, 'arial.ttf')) if engine == PdfEngine.RASTER else None
+    key = get_cache_key('calibration', calibration_version, engine, calibration_square_size, calibration_square_distance, hash_file(blank_path), font_hash)
+
+    manifest = load_page_manifest(manifest_path, key)
+    if manifest is not None and manifest.files.get(os.path.basename(pdf_path)) == get_file_stat(pdf_path):
+        return pdf_path, False
+
+    # Write to a temporary file first so that an interrupted build never looks up to date
+    temp_path = f'{pdf_path}.tmp'
+    if engine == PdfEngine.DIRECT:
+        save_direct_calibration_pdf(blank_path, temp_path)
+    else:
+        save_raster_calibration_pdf(blank_path, temp_path)
+    os.replace(temp_path, pdf_path)
+
+    with open(manifest_path, 'w') as manifest_file:
+        manifest_file.write(PageManifest(render_key=key, pages=[], files={os.path.basename(pdf_path): get_file_stat(pdf_path)}).model_dump_json(indent=4))
+
+    return pdf_path, True
+
+def generate_calibration(paper_sizes: Iterable[PaperSize], output_dir: str, engine: PdfEngine = PdfEngine.DIRECT, jobs: int = 1):
+    # Builds the calibration sheets of several paper sizes, in parallel with more than one job
+    os.makedirs(output_dir, exist_ok=True)
+    paper_sizes = list(dict.fromkeys(paper_sizes))
+
+    def print_result(pdf_path: str, built: bool):
+        print(f'{"Generated" if built else "Unchanged"} calibration PDF: {pdf_path}')
+
+    if jobs <= 1 or len(paper_sizes) <= 1:
+        for paper_size in paper_sizes:
+            print_result(*generate_calibration_pdf(paper_size, output_dir, engine))
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paper_sizes))) as executor:
+        futures = [executor.submit(generate_calibration_pdf, paper_size, output_dir, engine) for paper_size in paper_sizes]
+        for future in as_completed(futures):
+            print_result(*future.result())
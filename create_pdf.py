@@ -2,7 +2,7 @@ import os
 import re
 
 import click
-from utilities import CardSize, PaperSize, generate_pdf
+from enums import CardSize, ImageFormat, PaperSize, PdfEngine, RenderPreset
 
 front_directory = os.path.join('game', 'front')
 back_directory = os.path.join('game', 'back')
@@ -17,6 +17,8 @@ default_output_path = os.path.join(output_directory, 'game.pdf')
 @click.option("--double_sided_dir_path", default=double_sided_directory, show_default=True, help="The path to the directory containing card backs for double-sided cards.")
 @click.option("--output_path", default=default_output_path, show_default=True, help="The desired path to the output PDF.")
 @click.option("--output_images", default=False, is_flag=True, help="Create images instead of a PDF.")
+@click.option("--image_format", default=ImageFormat.PNG.value, type=click.Choice([t.value for t in ImageFormat], case_sensitive=False), show_default=True, help="The lossless format of the images created with \"--output_images\".")
+@click.option("--compress_level", default=6, type=click.IntRange(min=0, max=9), show_default=True, help="Compression effort of the images created with \"--output_images\". Lower values are faster but create larger files.")
 @click.option("--card_size", default=CardSize.STANDARD.value, type=click.Choice([t.value for t in CardSize], case_sensitive=False), show_default=True, help="The desired card size.")
 @click.option("--paper_size", default=PaperSize.LETTER.value, type=click.Choice([t.value for t in PaperSize], case_sensitive=False), show_default=True, help="The desired paper size.")
 @click.option("--only_fronts", default=False, is_flag=True, help="Only use the card fronts, exclude the card backs.")
@@ -27,6 +29,14 @@ default_output_path = os.path.join(output_directory, 'game.pdf')
 @click.option("--load_offset", default=False, is_flag=True, help="Apply saved offsets. See `offset_pdf.py` for more information.")
 @click.option("--skip", type=click.IntRange(min=0), multiple=True, help="Skip a card based on its index. Useful for registration issues. Examples: 0, 4.")
 @click.option("--name", help="Label each page of the PDF with a name.")
+@click.option("--jobs", default=1, type=click.IntRange(min=1), show_default=True, help="Number of processes used to compose sheets, and of threads used to compress pages, in parallel.")
+@click.option("--cache_size", default=0, type=click.IntRange(min=0), show_default=True, help="Maximum size in MB of the cache of processed card images and sheet templates, reused across runs. Use 0 to disable the cache.")
+@click.option("--output_cache_size", default=0, type=click.IntRange(min=0), show_default=True, help="Maximum size in MB of the cache of finished PDFs and images, copied as is when the same deck is created again with the same options. Use 0 to disable the cache.")
+@click.option("--engine", default=PdfEngine.RASTER.value, type=click.Choice([t.value for t in PdfEngine], case_sensitive=False), show_default=True, help="How the PDF is assembled. \"raster\" draws each sheet as one image, \"direct\" places each card image in the PDF as is.")
+@click.option("--preset", default=RenderPreset.PRINT.value, type=click.Choice([t.value for t in RenderPreset], case_sensitive=False), show_default=True, help="Trade quality for speed. \"draft\" is fastest for proofs, \"balanced\" is close to \"print\", which has the best quality.")
+@click.option("--check_only", default=False, is_flag=True, help="Only check the card images for problems, such as images that can't be decoded, without creating the PDF.")
+@click.option("--verify_images", default=False, is_flag=True, help="Decode every card image before creating the PDF, so that damaged images are reported before anything is rendered. Always done with \"--check_only\".")
+@click.option("--profile", default=False, is_flag=True, help="Time each stage of the render and save the report as profile.json and profile.folded, for flame graph tools, in the output directory.")
 @click.version_option("1.3.0")
 
 def cli(
@@ -35,6 +45,8 @@ def cli(
     double_sided_dir_path,
     output_path,
     output_images,
+    image_format,
+    compress_level,
     card_size,
     paper_size,
     only_fronts,
@@ -44,25 +56,46 @@ def cli(
     quality,
     skip,
     load_offset,
-    name
+    name,
+    jobs,
+    cache_size,
+    output_cache_size,
+    engine,
+    preset,
+    check_only,
+    verify_images,
+    profile
 ):
-    generate_pdf(
-        front_dir_path,
-        back_dir_path,
-        double_sided_dir_path,
-        output_path,
-        output_images,
-        card_size,
-        paper_size,
-        only_fronts,
-        crop,
-        extend_corners,
-        ppi,
-        quality,
-        skip,
-        load_offset,
-        name
-    )
+    # Imported here so that --help and invalid options don't wait for the image libraries
+    from utilities import generate_pdf, get_directory, profile_render
+
+    with profile_render(get_directory(output_path) if profile else None):
+        generate_pdf(
+            front_dir_path,
+            back_dir_path,
+            double_sided_dir_path,
+            output_path,
+            output_images,
+            card_size,
+            paper_size,
+            only_fronts,
+            crop,
+            extend_corners,
+            ppi,
+            quality,
+            skip,
+            load_offset,
+            name,
+            jobs,
+            cache_size,
+            engine,
+            image_format,
+            compress_level,
+            preset,
+            check_only,
+            output_cache_size,
+            verify_images
+        )
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
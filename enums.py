@@ -0,0 +1,41 @@
+# Kept apart from utilities so that the CLIs can list choices without importing the rendering dependencies
+from enum import Enum
+
+class CardSize(str, Enum):
+    STANDARD = "standard"
+    STANDARD_DOUBLE = "standard_double"
+    JAPANESE = "japanese"
+    POKER = "poker"
+    POKER_HALF = "poker_half"
+    BRIDGE = "bridge"
+    BRIDGE_SQUARE = "bridge_square"
+    TAROT = "tarot"
+    DOMINO = "domino"
+    DOMINO_SQUARE = "domino_square"
+
+class PaperSize(str, Enum):
+    LETTER = "letter"
+    TABLOID = "tabloid"
+    A4 = "a4"
+    A3 = "a3"
+    ARCHB = "archb"
+
+class PdfEngine(str, Enum):
+    RASTER = "raster"
+    DIRECT = "direct"
+
+class ImageFormat(str, Enum):
+    PNG = "png"
+    WEBP = "webp"
+    TIFF = "tiff"
+
+class RenderPreset(str, Enum):
+    DRAFT = "draft"
+    BALANCED = "balanced"
+    PRINT = "print"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
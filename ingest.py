@@ -0,0 +1,32 @@
+import os
+
+import click
+from enums import CardSize, RenderPreset
+
+front_directory = os.path.join('game', 'front')
+back_directory = os.path.join('game', 'back')
+double_sided_directory = os.path.join('game', 'double_sided')
+
+@click.command()
+@click.option("--front_dir_path", default=front_directory, show_default=True, help="The path to the directory containing the card fronts.")
+@click.option("--back_dir_path", default=back_directory, show_default=True, help="The path to the directory containing one or more card backs.")
+@click.option("--double_sided_dir_path", default=double_sided_directory, show_default=True, help="The path to the directory containing card backs for double-sided cards.")
+@click.option("--card_size", default=CardSize.STANDARD.value, type=click.Choice([t.value for t in CardSize], case_sensitive=False), show_default=True, help="The desired card size.")
+@click.option("--crop", help="Crop the outer portion of front and double-sided images. Examples: 3mm, 0.125in, 6.5.")
+@click.option("--extend_corners", default=0, type=click.IntRange(min=0), show_default=True, help="Reduce artifacts produced by rounded corners in card images.")
+@click.option("--ppi", default=300, type=click.IntRange(min=0), show_default=True, help="Pixels per inch (PPI) when creating PDF.")
+@click.option("--preset", default=RenderPreset.PRINT.value, type=click.Choice([t.value for t in RenderPreset], case_sensitive=False), show_default=True, help="The preset used with create_pdf.py.")
+@click.option("--jobs", type=click.IntRange(min=1), help="Number of processes used to convert images in parallel. Defaults to the number of CPUs.")
+@click.version_option("1.3.0")
+
+def cli(front_dir_path, back_dir_path, double_sided_dir_path, card_size, crop, extend_corners, ppi, preset, jobs):
+    # Imported here so that --help and invalid options don't wait for the image libraries
+    from utilities import ingest_card_images
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    ingest_card_images(front_dir_path, back_dir_path, double_sided_dir_path, card_size, crop, extend_corners, ppi, jobs, preset)
+
+if __name__ == '__main__':
+    cli()
@@ -1,8 +1,6 @@
 import os
 import click
-import pypdfium2 as pdfium
-
-from utilities import load_saved_offset, offset_images, save_offset
+from enums import PdfEngine
 
 output_directory = os.path.join('game', 'output')
 default_output_pdf_path = os.path.join(output_directory, 'game.pdf')
@@ -10,21 +8,29 @@ default_output_pdf_path = os.path.join(output_directory, 'game.pdf')
 @click.command()
 @click.option("--pdf_path", default=default_output_pdf_path, help="The path of the input PDF.")
 @click.option("--output_pdf_path", help="The desired path of the offset PDF.")
-@click.option("-x", "--x_offset", type=int, help="The desired offset in the x-axis.")
-@click.option("-y", "--y_offset", type=int, help="The desired offset in the y-axis.")
-@click.option("-s", "--save", default=False, is_flag=True, help="Save the x and y offset values.")
-@click.option("--ppi", default=300, type=click.IntRange(min=0), show_default=True, help="Pixels per inch (PPI) when creating PDF.")
+@click.option("-x", "--x_offset", type=float, help="The desired offset in the x-axis.")
+@click.option("-y", "--y_offset", type=float, help="The desired offset in the y-axis.")
+@click.option("-a", "--angle", type=float, help="The desired rotation in degrees, counterclockwise.")
+@click.option("-s", "--save", default=False, is_flag=True, help="Save the x and y offset and angle values.")
+@click.option("--engine", default=PdfEngine.RASTER.value, type=click.Choice([t.value for t in PdfEngine], case_sensitive=False), show_default=True, help="How the offset is applied. \"direct\" moves the content of the back pages as is, \"raster\" renders every page to an image.")
+@click.option("--ppi", default=300, type=click.IntRange(min=0), show_default=True, help="Pixels per inch (PPI) when creating PDF with the raster engine.")
+@click.option("--jobs", type=click.IntRange(min=1), help="Number of processes used to render pages in parallel with the raster engine. Defaults to the number of CPUs.")
+
+def offset_pdf(pdf_path, output_pdf_path, x_offset, y_offset, angle, save, engine, ppi, jobs):
+    # Imported here so that --help and invalid options don't wait for the image libraries
+    from utilities import load_saved_offset, offset_pdf_pages, render_offset_pdf_pages, save_offset
 
-def offset_pdf(pdf_path, output_pdf_path, x_offset, y_offset, save, ppi):
     new_x_offset = 0
     new_y_offset = 0
+    new_angle = 0
 
     saved_offset = load_saved_offset()
     if saved_offset is not None:
         new_x_offset = saved_offset.x_offset
         new_y_offset = saved_offset.y_offset
+        new_angle = saved_offset.angle
 
-        print(f'Loaded x offset: {new_x_offset}, y offset: {new_y_offset}')
+        print(f'Loaded x offset: {new_x_offset}, y offset: {new_y_offset}, angle: {new_angle}')
 
     # Check for new offset values
     if x_offset is not None:
@@ -33,31 +39,30 @@ def offset_pdf(pdf_path, output_pdf_path, x_offset, y_offset, save, ppi):
     if y_offset is not None:
         new_y_offset = y_offset
 
-    print(f'Using x offset: {new_x_offset}, y offset: {new_y_offset}')
+    if angle is not None:
+        new_angle = angle
+
+    print(f'Using x offset: {new_x_offset}, y offset: {new_y_offset}, angle: {new_angle}')
 
     # Save new offset
     if save:
-        save_offset(new_x_offset, new_y_offset)
+        save_offset(new_x_offset, new_y_offset, new_angle)
         print(f'Saved offset')
 
-    try:
-        pdf = pdfium.PdfDocument(pdf_path)
+    # The default for output_pdf_path is the original path but with _offset.py appended to the end.
+    if output_pdf_path is None:
+        output_pdf_path = f'{pdf_path.removesuffix(".pdf")}_offset.pdf'
 
-        # Get all the raw page images from the PDF
-        raw_images = []
-        for page_number in range(len(pdf)):
-            print(f"Page {page_number + 1}")
-            page = pdf.get_page(page_number)
-            raw_images.append(page.render(ppi/72).to_pil())
-
-        # Offset images
-        final_images = offset_images(raw_images, new_x_offset, new_y_offset, ppi)
+    try:
+        if engine == PdfEngine.DIRECT:
+            page_count = offset_pdf_pages(pdf_path, output_pdf_path, new_x_offset, new_y_offset, new_angle)
+            print(f'Offset {page_count // 2} back page{"s" if page_count // 2 != 1 else ""}')
+        else:
+            if jobs is None:
+                jobs = os.cpu_count() or 1
 
-        # The default for output_pdf_path is the original path but with _offset.py appended to the end.
-        if output_pdf_path is None:
-            output_pdf_path = f'{pdf_path.removesuffix(".pdf")}_offset.pdf'
+            render_offset_pdf_pages(pdf_path, output_pdf_path, new_x_offset, new_y_offset, new_angle, ppi, jobs=jobs)
 
-        final_images[0].save(output_pdf_path, save_all=True, append_images=final_images[1:], resolution=ppi, speed=0, subsampling=0, quality=100)
         print(f'Offset PDF: {output_pdf_path}')
     except FileNotFoundError as e:
         print(f"Cannot offset nonexistent PDF: {e}")
@@ -1,8 +1,14 @@
 from os import path
-from requests import Response, get
 from time import sleep
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from requests import Response
+
+def request_altered(query: str) -> 'Response':
+    # Imported here since requests is slow to import and isn't needed for --help
+    from requests import get
 
-def request_altered(query: str) -> Response:
     r = get(query, headers = {'user-agent': 'silhouette-card-maker/0.1', 'accept': '*/*'})
 
     r.raise_for_status()
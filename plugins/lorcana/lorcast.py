@@ -1,14 +1,18 @@
 import os
 import re
-import requests
 import time
 from io import BytesIO
+from typing import TYPE_CHECKING
 
-from PIL import Image
+if TYPE_CHECKING:
+    import requests
 
 def request_lorcast(
     query: str,
-) -> requests.Response:
+) -> 'requests.Response':
+    # Imported here since requests is slow to import and isn't needed for --help
+    import requests
+
     r = requests.get(query, headers = {'user-agent': 'silhouette-card-maker/0.1', 'accept': '*/*'})
 
     # Check for 2XX response code
@@ -53,6 +57,8 @@ def fetch_card(
     else:
         raise Exception(f'No images available for "{name}"')
 
+    from PIL import Image
+
     card_art = Image.open(BytesIO(request_lorcast(card_front_image_url).content))
 
     if card_art is not None:
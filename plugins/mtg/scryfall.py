@@ -1,14 +1,19 @@
 import os
-from typing import List, Set, Tuple
+from typing import List, Set, Tuple, TYPE_CHECKING
 import re
-import requests
 import time
 
+if TYPE_CHECKING:
+    import requests
+
 double_sided_layouts = ['transform', 'modal_dfc']
 
 def request_scryfall(
     query: str,
-) -> requests.Response:
+) -> 'requests.Response':
+    # Imported here since requests is slow to import and isn't needed for --help
+    import requests
+
     r = requests.get(query, headers = {'user-agent': 'silhouette-card-maker/0.1', 'accept': '*/*'})
 
     # Check for 2XX response code
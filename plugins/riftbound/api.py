@@ -2,7 +2,10 @@ from os import path
 from re import compile, search, sub
 from enum import Enum
 import time
-import requests
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
 
 PILTOVER_URL_TEMPLATE = 'https://piltoverarchive.com/_next/image?url=https://cdn.piltoverarchive.com/cards/{card_number}.webp&w=1920&q=75'
 RIFTMANA_URL_TEMPLATE = 'https://riftmana.com/wp-content/uploads/Cards/{card_number}.webp'
@@ -11,7 +14,10 @@ class ImageServer(str, Enum):
     PILTOVER = 'piltover_archive'
     RIFTMANA = 'riftmana'
 
-def request_api(query: str) -> requests.Response:
+def request_api(query: str) -> 'requests.Response':
+    # Imported here since requests is slow to import and isn't needed for --help
+    import requests
+
     r = requests.get(query, headers = {'user-agent': 'silhouette-card-maker/0.1', 'accept': '*/*'})
     r.raise_for_status()
     time.sleep(0.15)
@@ -1,8 +1,8 @@
 # Based on https://github.com/Yeet195/DeckParser
 
-import numpy as np
 import base64
 from enum import Enum
+import struct
 
 def cards(deck):
     # Converts decks from [[main][extra][side]] to {[passcode]:[quantity]}
@@ -14,7 +14,8 @@ def cards(deck):
     return card_dict
 
 def base64_to_passcodes(b64_string):
-    return np.frombuffer(base64.b64decode(b64_string), dtype=np.uint32).tolist()
+    # Passcodes are little-endian unsigned 32-bit integers
+    return [passcode for (passcode,) in struct.iter_unpack('<I', base64.b64decode(b64_string))]
 
 def parse_ydke(file_path):
     if not (file_path.startswith("ydke://") or file_path.endswith(".txt")):
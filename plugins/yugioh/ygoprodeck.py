@@ -1,8 +1,14 @@
 import os
-import requests
 import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+def request_api(query: str) -> 'requests.Response':
+    # Imported here since requests is slow to import and isn't needed for --help
+    import requests
 
-def request_api(query: str) -> requests.Response:
     r = requests.get(query, headers = {'user-agent': 'silhouette-card-maker/0.1', 'accept': '*/*'})
     r.raise_for_status()
     time.sleep(0.15)
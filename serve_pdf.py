@@ -0,0 +1,24 @@
+import os
+
+import click
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True, help="The address to accept jobs on. Anyone who can reach it can write files on this computer, so keep it local.")
+@click.option("--port", default=8000, type=click.IntRange(min=0, max=65535), show_default=True, help="The port to accept jobs on.")
+@click.option("--workers", type=click.IntRange(min=1), help="Number of jobs rendered at once, by processes that stay loaded between jobs. Defaults to the number of CPUs.")
+@click.option("--jobs", default=1, type=click.IntRange(min=1), show_default=True, help="Number of processes used to compose the sheets of each job in parallel.")
+@click.option("--cache_size", default=0, type=click.IntRange(min=0), show_default=True, help="Maximum size in MB of the cache of processed card images and sheet templates, reused across runs. Use 0 to disable the cache.")
+@click.option("--output_cache_size", default=0, type=click.IntRange(min=0), show_default=True, help="Maximum size in MB of the cache of finished PDFs and images, copied as is when the same deck is created again with the same options. Use 0 to disable the cache.")
+@click.version_option("1.3.0")
+
+def cli(host, port, workers, jobs, cache_size, output_cache_size):
+    # Imported here so that --help and invalid options don't wait for the image libraries
+    from server import serve_render_jobs
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    serve_render_jobs(host, port, workers, jobs, cache_size, output_cache_size)
+
+if __name__ == '__main__':
+    cli()
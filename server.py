@@ -0,0 +1,261 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import shutil
+import signal
+import threading
+from typing import List
+import uuid
+import zipfile
+
+from batch import BatchJob, render_batch_job
+from enums import ImageFormat, JobStatus
+from pydantic import BaseModel, ValidationError
+from utilities import get_directory, get_manifest_path, get_page_image_filename, load_label_font, load_layouts
+
+class ServerJob(BaseModel):
+    id: str
+    job: BatchJob
+    status: JobStatus = JobStatus.QUEUED
+
+    # Output of the render, the error that stopped it and its duration in seconds, once it's finished
+    log: str = ''
+    error: str | None = None
+    duration: float | None = None
+
+def warm_up_render_worker():
+    # Ctrl+C stops the server, which lets the workers finish their jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Loaded once by each worker rather than by each job, the most recent registration images stay loaded after their job
+    load_layouts()
+    load_label_font(40)
+
+class RenderQueue:
+    """
+    Renders the jobs submitted to the render server in order. Up to workers
+    jobs are rendered at once by long-lived worker processes, which keep the
+    layouts, fonts and the most recent registration images they have loaded
+    for the jobs that follow. Only the most recent finished jobs are
+    remembered.
+    """
+
+    max_finished_jobs = 1000
+
+    def __init__(self, workers: int, jobs: int = 1, cache_size: int = 0, output_cache_size: int = 0):
+        self.workers = workers
+        self.jobs = jobs
+        self.cache_size = cache_size
+        self.output_cache_size = output_cache_size
+
+        self._server_jobs: OrderedDict[str, ServerJob] = OrderedDict()
+        self._queued: deque[str] = deque()
+        self._num_running = 0
+
+        # Reentrant, since a job that finishes right away calls back while the lock is held
+        self._lock = threading.RLock()
+
+        # Start the workers now rather than when the first jobs arrive
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up_render_worker)
+        for _ in range(workers):
+            self._executor.submit(os.getpid)
+
+    def submit(self, job: BatchJob) -> ServerJob:
+        server_job = ServerJob(id=uuid.uuid4().hex, job=job)
+        print(f'Queued job {server_job.id}: {job.output_path}')
+
+        with self._lock:
+            self._server_jobs[server_job.id] = server_job
+            self._queued.append(server_job.id)
+            self._start_jobs()
+
+            return server_job.model_copy()
+
+    def get(self, job_id: str) -> ServerJob | None:
+        with self._lock:
+            server_job = self._server_jobs.get(job_id)
+            return None if server_job is None else server_job.model_copy()
+
+    def list_jobs(self) -> List[ServerJob]:
+        with self._lock:
+            return [server_job.model_copy() for server_job in self._server_jobs.values()]
+
+    def close(self):
+        # Queued jobs are dropped, running jobs are finished
+        with self._lock:
+            self._queued.clear()
+            num_running = self._num_running
+
+        if num_running > 0:
+            print(f'Finishing {num_running} running job{"s" if num_running != 1 else ""}')
+
+        self._executor.shutdown()
+
+    def _start_jobs(self):
+        while len(self._queued) > 0 and self._num_running < self.workers:
+            server_job = self._server_jobs[self._queued.popleft()]
+            server_job.status = JobStatus.RUNNING
+            self._num_running += 1
+
+            future = self._executor.submit(render_batch_job, server_job.job, self.jobs, self.cache_size, self.output_cache_size)
+            future.add_done_callback(functools.partial(self._finish_job, server_job.id))
+
+    def _finish_job(self, job_id: str, future: Future):
+        try:
+            log, duration, error = future.result()
+        except Exception as e:
+            # The worker itself failed, for example because it ran out of memory
+            log, duration, error = '', None, str(e) or type(e).__name__
+
+        with self._lock:
+            server_job = self._server_jobs[job_id]
+            server_job.log = log
+            server_job.duration = duration
+            server_job.error = error
+            server_job.status = JobStatus.DONE if error is None else JobStatus.FAILED
+            self._num_running -= 1
+
+            finished_jobs = [job.id for job in self._server_jobs.values() if job.status in (JobStatus.DONE, JobStatus.FAILED)]
+            for finished_job_id in finished_jobs[:max(0, len(finished_jobs) - self.max_finished_jobs)]:
+                del self._server_jobs[finished_job_id]
+
+            self._start_jobs()
+
+        if error is None:
+            print(f'Finished job {job_id} in {duration:.1f}s')
+        else:
+            print(f'Failed job {job_id}: {error}')
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the render server:
+
+    POST /jobs              queues a job, with the same keys as a batch job
+    GET  /jobs              lists the jobs, without their logs
+    GET  /jobs/<id>         returns a job
+    GET  /jobs/<id>/output  downloads the PDF of a finished job, or a ZIP of its images
+    """
+
+    server_version = 'RenderServer/1.3.0'
+
+    def log_message(self, format, *args):
+        # Clients poll often, only the jobs themselves are worth printing
+        pass
+
+    def _send_json(self, status: int, body: str):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, json.dumps({'error': message}))
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            self._send_error(404, f'Unknown path "{self.path}".')
+            return
+
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            job = BatchJob.model_validate_json(body)
+        except (ValueError, ValidationError) as e:
+            self._send_error(400, f'Cannot parse job: {e}')
+            return
+
+        server_job = self.server.render_queue.submit(job)
+        self._send_json(202, server_job.model_dump_json())
+
+    def do_GET(self):
+        parts = [part for part in self.path.split('/') if part != '']
+        if len(parts) == 0 or parts[0] != 'jobs' or len(parts) > 3 or (len(parts) == 3 and parts[2] != 'output'):
+            self._send_error(404, f'Unknown path "{self.path}".')
+            return
+
+        if len(parts) == 1:
+            server_jobs = self.server.render_queue.list_jobs()
+            self._send_json(200, json.dumps([server_job.model_dump(mode='json', exclude={'log'}) for server_job in server_jobs]))
+            return
+
+        server_job = self.server.render_queue.get(parts[1])
+        if server_job is None:
+            self._send_error(404, f'Unknown job "{parts[1]}".')
+            return
+
+        if len(parts) == 2:
+            self._send_json(200, server_job.model_dump_json())
+            return
+
+        if server_job.status == JobStatus.FAILED:
+            self._send_error(409, f'Job "{server_job.id}" failed: {server_job.error}')
+            return
+
+        if server_job.status != JobStatus.DONE:
+            self._send_error(409, f'Job "{server_job.id}" is still {server_job.status.value}.')
+            return
+
+        try:
+            if server_job.job.output_images:
+                self._send_images(server_job.job.output_path, server_job.job.image_format)
+            else:
+                self._send_pdf(server_job.job.output_path)
+        except OSError as e:
+            self._send_error(410, f'Cannot read the output of job "{server_job.id}": {e}')
+
+    def _send_pdf(self, output_path: str):
+        with open(output_path, 'rb') as output_file:
+            size = os.fstat(output_file.fileno()).st_size
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(size))
+            self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(output_path)}"')
+            self.end_headers()
+            shutil.copyfileobj(output_file, self.wfile)
+
+    def _send_images(self, output_path: str, image_format: ImageFormat):
+        # The manifest lists the pages of the render, other files in the directory are left out
+        output_path = get_directory(output_path)
+        with open(get_manifest_path(output_path, True), 'r') as manifest_file:
+            num_pages = len(json.load(manifest_file)['pages'])
+
+        # Fail before anything is sent when a page is missing
+        page_paths = [os.path.join(output_path, get_page_image_filename(page_index, image_format)) for page_index in range(num_pages)]
+        for page_path in page_paths:
+            os.stat(page_path)
+
+        # The pages are already compressed, and the size of the ZIP isn't known up front, so the connection is closed once it's sent
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(output_path)}.zip"')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        with zipfile.ZipFile(self.wfile, 'w', zipfile.ZIP_STORED) as zip_file:
+            for page_path in page_paths:
+                zip_file.write(page_path, os.path.basename(page_path))
+
+def serve_render_jobs(host: str, port: int, workers: int, jobs: int = 1, cache_size: int = 0, output_cache_size: int = 0):
+    """
+    Runs the render server until it's interrupted. Jobs are rendered like
+    the jobs of a batch, by workers that stay warm between jobs, so each
+    job only pays for its own images.
+    """
+    render_queue = RenderQueue(workers, jobs, cache_size, output_cache_size)
+
+    server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.render_queue = render_queue
+    print(f'Accepting jobs at http://{host}:{server.server_port}/jobs with {workers} worker{"s" if workers != 1 else ""}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        render_queue.close()
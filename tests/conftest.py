@@ -0,0 +1,33 @@
+import os
+import shutil
+import sys
+
+from PIL import Image
+import pytest
+
+repo_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_directory)
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # Assets are read and caches, manifests and offsets are written relative to the working directory,
+    # so tests run in a copy of the assets rather than in the repository
+    workspace_path = tmp_path / 'workspace'
+    shutil.copytree(os.path.join(repo_directory, 'assets'), workspace_path / 'assets')
+    monkeypatch.chdir(workspace_path)
+
+    return workspace_path
+
+@pytest.fixture
+def deck(tmp_path):
+    # Ten fronts of different colors, which fill two sheets of standard cards on letter paper, and one back
+    deck_path = tmp_path / 'deck'
+    for directory in ('front', 'back', 'double_sided'):
+        os.makedirs(deck_path / directory)
+
+    for index in range(10):
+        Image.new('RGB', (750, 1050), (index * 25, 100, 200 - index * 20)).save(deck_path / 'front' / f'card{index + 1}.png')
+
+    Image.new('RGB', (750, 1050), 'gray').save(deck_path / 'back' / 'back.png')
+
+    return deck_path
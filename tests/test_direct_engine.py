@@ -0,0 +1,55 @@
+import os
+
+from PIL import Image
+
+from enums import PdfEngine
+from utilities import generate_pdf
+
+def create_deck(deck_path, card_size: tuple[int, int]):
+    for directory in ('front', 'back', 'double_sided'):
+        os.makedirs(deck_path / directory)
+
+    # Noise compresses poorly, so a card that is embedded larger than needed shows in the file size
+    Image.effect_noise(card_size, 64).convert('RGB').save(deck_path / 'front' / 'card.jpg', quality=95)
+    Image.new('RGB', (750, 1050), 'gray').save(deck_path / 'back' / 'back.jpg')
+
+def render(deck_path, output_path, engine: PdfEngine, ppi: int):
+    generate_pdf(
+        str(deck_path / 'front'),
+        str(deck_path / 'back'),
+        str(deck_path / 'double_sided'),
+        str(output_path),
+        False,
+        'standard',
+        'letter',
+        True,
+        None,
+        0,
+        ppi,
+        75,
+        [],
+        False,
+        None,
+        engine=engine
+    )
+
+    return os.path.getsize(output_path)
+
+def test_oversized_jpeg_is_no_larger_than_raster(tmp_path, workspace):
+    create_deck(tmp_path / 'deck', (3000, 4200))
+
+    raster_size = render(tmp_path / 'deck', tmp_path / 'raster.pdf', PdfEngine.RASTER, 300)
+    direct_size = render(tmp_path / 'deck', tmp_path / 'direct.pdf', PdfEngine.DIRECT, 300)
+
+    assert direct_size <= raster_size
+
+def test_jpeg_close_to_slot_size_is_embedded_as_is(tmp_path, workspace):
+    create_deck(tmp_path / 'deck', (750, 1050))
+
+    render(tmp_path / 'deck', tmp_path / 'direct.pdf', PdfEngine.DIRECT, 300)
+
+    with open(tmp_path / 'deck' / 'front' / 'card.jpg', 'rb') as card_file:
+        jpeg = card_file.read()
+
+    with open(tmp_path / 'direct.pdf', 'rb') as pdf_file:
+        assert jpeg in pdf_file.read()
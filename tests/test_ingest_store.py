@@ -0,0 +1,81 @@
+import os
+
+from PIL import Image
+
+from caches import IngestStore
+from enums import RenderPreset
+import utilities
+from utilities import generate_pdf, ingest_card_images
+
+tile_options = (750, 1050, (0.0, 0.0), 1.0, 0, False, RenderPreset.PRINT)
+
+def ingest(ingest_store: IngestStore, image_path: str, color: str = 'blue'):
+    ingest_store.put(image_path, IngestStore.get_source(image_path), *tile_options, Image.new('RGB', (750, 1050), color))
+
+def test_tile_is_used_while_its_image_is_unchanged(tmp_path):
+    image_path = str(tmp_path / 'card.png')
+    Image.new('RGB', (750, 1050), 'red').save(image_path)
+
+    ingest_store = IngestStore(str(tmp_path / 'ingest'))
+    assert not ingest_store.has(image_path, *tile_options)
+
+    ingest(ingest_store, image_path)
+
+    assert ingest_store.has(image_path, *tile_options)
+    assert ingest_store.get(image_path, *tile_options).getpixel((0, 0)) == (0, 0, 255)
+
+def test_changed_image_invalidates_its_tile(tmp_path):
+    image_path = str(tmp_path / 'card.png')
+    Image.new('RGB', (750, 1050), 'red').save(image_path)
+
+    ingest_store = IngestStore(str(tmp_path / 'ingest'))
+    ingest(ingest_store, image_path)
+
+    Image.new('RGB', (750, 1050), 'green').save(image_path)
+    stat = os.stat(image_path)
+    os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert not ingest_store.has(image_path, *tile_options)
+    assert ingest_store.get(image_path, *tile_options) is None
+
+def test_tile_is_only_used_with_its_options(tmp_path):
+    image_path = str(tmp_path / 'card.png')
+    Image.new('RGB', (750, 1050), 'red').save(image_path)
+
+    ingest_store = IngestStore(str(tmp_path / 'ingest'))
+    ingest(ingest_store, image_path)
+
+    # Renders sometimes give the crop as integers
+    assert ingest_store.has(image_path, 750, 1050, (0, 0), 1.0, 0, False, RenderPreset.PRINT)
+
+    assert not ingest_store.has(image_path, 750, 1050, (0.0, 0.0), 1.0, 0, True, RenderPreset.PRINT)
+    assert not ingest_store.has(image_path, 750, 1050, (3.0, 3.0), 1.0, 0, False, RenderPreset.PRINT)
+    assert not ingest_store.has(image_path, 750, 1050, (0.0, 0.0), 2.0, 0, False, RenderPreset.PRINT)
+
+def test_deleted_image_has_no_tile(tmp_path):
+    image_path = str(tmp_path / 'card.png')
+    Image.new('RGB', (750, 1050), 'red').save(image_path)
+
+    ingest_store = IngestStore(str(tmp_path / 'ingest'))
+    ingest(ingest_store, image_path)
+    os.remove(image_path)
+
+    assert not ingest_store.has(image_path, *tile_options)
+
+def test_render_only_loads_images_changed_since_ingest(deck, tmp_path, workspace, monkeypatch):
+    ingest_card_images(str(deck / 'front'), str(deck / 'back'), str(deck / 'double_sided'), 'standard', None, 0, 150)
+    Image.new('RGB', (750, 1050), 'red').save(deck / 'front' / 'card3.png')
+
+    loaded_paths = []
+    load_card_image = utilities.load_card_image
+    def record_load(image_path, *args, **kwargs):
+        loaded_paths.append(image_path)
+        return load_card_image(image_path, *args, **kwargs)
+
+    monkeypatch.setattr(utilities, 'load_card_image', record_load)
+    os.makedirs(tmp_path / 'output')
+    generate_pdf(str(deck / 'front'), str(deck / 'back'), str(deck / 'double_sided'), str(tmp_path / 'output'), True, 'standard', 'letter', False, None, 0, 150, 75, [], False, None)
+
+    assert loaded_paths == [str(deck / 'front' / 'card3.png')]
+    with Image.open(tmp_path / 'output' / 'page1.png') as page:
+        assert page.convert('RGB').getpixel((1658 // 2 + 100, 231 // 2 + 100)) == (255, 0, 0)
@@ -0,0 +1,86 @@
+import os
+
+from PIL import Image
+
+from caches import OutputCache
+import utilities
+from utilities import generate_pdf
+
+def render(deck_path, output_path, output_cache_size: int = 64):
+    generate_pdf(
+        str(deck_path / 'front'),
+        str(deck_path / 'back'),
+        str(deck_path / 'double_sided'),
+        str(output_path),
+        False,
+        'standard',
+        'letter',
+        False,
+        None,
+        0,
+        150,
+        75,
+        [],
+        False,
+        None,
+        output_cache_size=output_cache_size
+    )
+
+def read_file(path) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+def fail_to_compose(*args, **kwargs):
+    raise AssertionError('The render was composed rather than copied from the output cache')
+
+def test_identical_render_is_copied(deck, tmp_path, workspace, monkeypatch, capsys):
+    render(deck, tmp_path / 'first.pdf')
+    assert 'output cache' not in capsys.readouterr().out
+
+    monkeypatch.setattr(utilities, 'compose_sheets', fail_to_compose)
+    render(deck, tmp_path / 'second.pdf')
+
+    assert 'Copied an identical render from the output cache' in capsys.readouterr().out
+    assert read_file(tmp_path / 'second.pdf') == read_file(tmp_path / 'first.pdf')
+
+def test_changed_image_is_rendered(deck, tmp_path, workspace, capsys):
+    render(deck, tmp_path / 'first.pdf')
+
+    Image.new('RGB', (750, 1050), 'red').save(deck / 'front' / 'card3.png')
+    capsys.readouterr()
+    render(deck, tmp_path / 'second.pdf')
+
+    assert 'output cache' not in capsys.readouterr().out
+    assert read_file(tmp_path / 'second.pdf') != read_file(tmp_path / 'first.pdf')
+
+def test_output_edited_in_place_is_not_restored(deck, tmp_path, workspace, capsys):
+    render(deck, tmp_path / 'first.pdf')
+    rendered = read_file(tmp_path / 'first.pdf')
+
+    # The output shares its file with the cache, so editing it in place edits the cached render too
+    with open(tmp_path / 'first.pdf', 'r+b') as output_file:
+        output_file.write(b'%PDF-edited')
+
+    capsys.readouterr()
+    render(deck, tmp_path / 'second.pdf')
+
+    assert 'output cache' not in capsys.readouterr().out
+    assert read_file(tmp_path / 'second.pdf') == rendered
+
+def test_restored_output_can_be_edited_on_its_own(deck, tmp_path, workspace):
+    render(deck, tmp_path / 'first.pdf')
+    render(deck, tmp_path / 'second.pdf')
+    rendered = read_file(tmp_path / 'first.pdf')
+
+    with open(tmp_path / 'second.pdf', 'r+b') as output_file:
+        output_file.write(b'%PDF-edited')
+
+    render(deck, tmp_path / 'third.pdf')
+
+    assert read_file(tmp_path / 'third.pdf') == rendered
+
+def test_unknown_render_is_a_miss(tmp_path):
+    output_cache = OutputCache(str(tmp_path / 'outputs'))
+
+    assert output_cache.restore('0' * 64, str(tmp_path / 'output.pdf'), False) is None
+    assert not os.path.exists(tmp_path / 'output.pdf')
@@ -0,0 +1,74 @@
+import os
+
+from PIL import Image
+
+from utilities import generate_pdf
+
+def render(deck_path, output_path):
+    os.makedirs(output_path, exist_ok=True)
+    generate_pdf(
+        str(deck_path / 'front'),
+        str(deck_path / 'back'),
+        str(deck_path / 'double_sided'),
+        str(output_path),
+        True,
+        'standard',
+        'letter',
+        False,
+        None,
+        0,
+        150,
+        75,
+        [],
+        False,
+        None
+    )
+
+def read_pages(output_path) -> dict[str, bytes]:
+    pages = {}
+    for filename in sorted(os.listdir(output_path)):
+        if filename.endswith('.png'):
+            with open(output_path / filename, 'rb') as page_file:
+                pages[filename] = page_file.read()
+
+    return pages
+
+def test_unchanged_sheets_are_reused(deck, tmp_path, workspace, capsys):
+    render(deck, tmp_path / 'output')
+    first_pages = read_pages(tmp_path / 'output')
+
+    # The last card is on the second sheet
+    Image.new('RGB', (750, 1050), 'red').save(deck / 'front' / 'card10.png')
+    capsys.readouterr()
+    render(deck, tmp_path / 'output')
+
+    assert 'Reused 1 unchanged sheet from the previous render' in capsys.readouterr().out
+
+    pages = read_pages(tmp_path / 'output')
+    assert pages['page1.png'] == first_pages['page1.png']
+    assert pages['page2.png'] == first_pages['page2.png']
+    assert pages['page3.png'] != first_pages['page3.png']
+
+    # The updated render is the same as a render from scratch
+    render(deck, tmp_path / 'fresh')
+    assert pages == read_pages(tmp_path / 'fresh')
+
+def test_edited_page_is_drawn_again(deck, tmp_path, workspace, capsys):
+    render(deck, tmp_path / 'output')
+    first_pages = read_pages(tmp_path / 'output')
+
+    Image.new('RGB', (2550 // 2, 3300 // 2), 'white').save(tmp_path / 'output' / 'page1.png')
+    capsys.readouterr()
+    render(deck, tmp_path / 'output')
+
+    assert 'Reused 1 unchanged sheet from the previous render' in capsys.readouterr().out
+    assert read_pages(tmp_path / 'output') == first_pages
+
+def test_removed_cards_remove_their_pages(deck, tmp_path, workspace):
+    render(deck, tmp_path / 'output')
+
+    for index in range(9, 11):
+        os.remove(deck / 'front' / f'card{index}.png')
+    render(deck, tmp_path / 'output')
+
+    assert sorted(read_pages(tmp_path / 'output')) == ['page1.png', 'page2.png']
@@ -0,0 +1,75 @@
+import os
+
+from PIL import Image
+import pytest
+
+from utilities import generate_pdf
+
+def render(deck_path, output_path, **kwargs):
+    generate_pdf(
+        str(deck_path / 'front'),
+        str(deck_path / 'back'),
+        str(deck_path / 'double_sided'),
+        str(output_path),
+        False,
+        'standard',
+        'letter',
+        False,
+        None,
+        0,
+        150,
+        75,
+        [],
+        False,
+        None,
+        **kwargs
+    )
+
+def truncate_card(deck_path):
+    # The header of a truncated JPEG is intact, only decoding it fails
+    Image.effect_noise((750, 1050), 64).convert('RGB').save(deck_path / 'front' / 'card1.jpg', quality=95)
+    with open(deck_path / 'front' / 'card1.jpg', 'r+b') as card_file:
+        card_file.truncate(os.path.getsize(deck_path / 'front' / 'card1.jpg') // 2)
+
+def test_every_error_is_reported_before_rendering(deck, tmp_path, workspace, capsys):
+    Image.new('RGB', (750, 1050), 'white').save(deck / 'double_sided' / 'card11.png')
+    with open(deck / 'front' / 'notes.png', 'w') as notes_file:
+        notes_file.write('Not an image')
+
+    with pytest.raises(Exception, match='Found 2 problems with the card images, nothing was rendered.'):
+        render(deck, tmp_path / 'output.pdf')
+
+    out = capsys.readouterr().out
+    assert 'Error: Double-sided back "card11.png" does not have a matching front.' in out
+    assert f'Error: Cannot open "{deck / "front" / "notes.png"}" as an image.' in out
+    assert not os.path.exists(tmp_path / 'output.pdf')
+
+def test_stretched_image_is_a_warning(deck, tmp_path, workspace, capsys):
+    Image.new('RGB', (1050, 1050), 'white').save(deck / 'front' / 'card1.png')
+
+    render(deck, tmp_path / 'output.pdf')
+
+    assert f'Warning: "{deck / "front" / "card1.png"}" is 1050x1050 pixels and is stretched by' in capsys.readouterr().out
+    assert os.path.exists(tmp_path / 'output.pdf')
+
+def test_check_only_decodes_the_images(deck, tmp_path, workspace, capsys):
+    truncate_card(deck)
+
+    with pytest.raises(Exception, match='Found 1 problem with the card images'):
+        render(deck, tmp_path / 'output.pdf', check_only=True)
+
+    assert f'Error: Cannot decode "{deck / "front" / "card1.jpg"}"' in capsys.readouterr().out
+
+def test_verify_images_decodes_the_images_before_rendering(deck, tmp_path, workspace, capsys):
+    truncate_card(deck)
+
+    with pytest.raises(Exception, match='Found 1 problem with the card images, nothing was rendered.'):
+        render(deck, tmp_path / 'output.pdf', verify_images=True)
+
+    assert f'Error: Cannot decode "{deck / "front" / "card1.jpg"}"' in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / 'output.pdf')
+
+def test_check_only_renders_nothing(deck, tmp_path, workspace):
+    render(deck, tmp_path / 'output.pdf', check_only=True)
+
+    assert not os.path.exists(tmp_path / 'output.pdf')
@@ -0,0 +1,111 @@
+from http.server import ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from batch import BatchJob
+from enums import JobStatus
+from server import RenderQueue, RenderRequestHandler
+
+def create_job(deck_path, output_path, **kwargs) -> BatchJob:
+    return BatchJob(
+        front_dir_path=str(deck_path / 'front'),
+        back_dir_path=str(deck_path / 'back'),
+        double_sided_dir_path=str(deck_path / 'double_sided'),
+        output_path=str(output_path),
+        ppi=150,
+        **kwargs
+    )
+
+def wait_for_job(render_queue: RenderQueue, job_id: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        server_job = render_queue.get(job_id)
+        if server_job.status in (JobStatus.DONE, JobStatus.FAILED):
+            return server_job
+
+        time.sleep(0.05)
+
+    raise TimeoutError(f'Job {job_id} did not finish')
+
+@pytest.fixture
+def render_queue(workspace):
+    render_queue = RenderQueue(1)
+    yield render_queue
+    render_queue.close()
+
+def test_job_is_rendered(deck, tmp_path, render_queue):
+    server_job = render_queue.submit(create_job(deck, tmp_path / 'output.pdf'))
+    assert server_job.status == JobStatus.RUNNING
+
+    server_job = wait_for_job(render_queue, server_job.id)
+
+    assert server_job.status == JobStatus.DONE
+    assert server_job.error is None
+    assert server_job.duration > 0
+    assert f'Generated PDF: {tmp_path / "output.pdf"}' in server_job.log
+    assert os.path.exists(tmp_path / 'output.pdf')
+
+def test_jobs_wait_for_a_free_worker(deck, tmp_path, render_queue):
+    first_job = render_queue.submit(create_job(deck, tmp_path / 'first.pdf'))
+    second_job = render_queue.submit(create_job(deck, tmp_path / 'second.pdf'))
+    assert second_job.status == JobStatus.QUEUED
+
+    assert wait_for_job(render_queue, first_job.id).status == JobStatus.DONE
+    assert wait_for_job(render_queue, second_job.id).status == JobStatus.DONE
+    assert [server_job.id for server_job in render_queue.list_jobs()] == [first_job.id, second_job.id]
+
+def test_failed_job_is_reported_and_the_queue_goes_on(deck, tmp_path, render_queue):
+    failed_job = render_queue.submit(create_job(tmp_path / 'missing', tmp_path / 'failed.pdf'))
+    next_job = render_queue.submit(create_job(deck, tmp_path / 'output.pdf'))
+
+    failed_job = wait_for_job(render_queue, failed_job.id)
+    assert failed_job.status == JobStatus.FAILED
+    assert failed_job.error == f'Front image directory path "{tmp_path / "missing" / "front"}" is invalid.'
+    assert not os.path.exists(tmp_path / 'failed.pdf')
+
+    assert wait_for_job(render_queue, next_job.id).status == JobStatus.DONE
+
+def test_unknown_job_is_none(render_queue):
+    assert render_queue.get('missing') is None
+
+def test_http_api(deck, tmp_path, render_queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RenderRequestHandler)
+    server.render_queue = render_queue
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/jobs'
+
+    def post_job(job: BatchJob) -> dict:
+        request = urllib.request.Request(url, data=job.model_dump_json().encode(), method='POST')
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 202
+            return json.load(response)
+
+    try:
+        job_id = post_job(create_job(deck, tmp_path / 'output.pdf'))['id']
+        failed_job_id = post_job(create_job(tmp_path / 'missing', tmp_path / 'failed.pdf'))['id']
+        wait_for_job(render_queue, job_id)
+        wait_for_job(render_queue, failed_job_id)
+
+        with urllib.request.urlopen(f'{url}/{job_id}/output') as response:
+            assert response.headers['Content-Type'] == 'application/pdf'
+            with open(tmp_path / 'output.pdf', 'rb') as output_file:
+                assert response.read() == output_file.read()
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f'{url}/{failed_job_id}/output')
+        assert error.value.code == 409
+        assert 'is invalid' in json.load(error.value)['error']
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url, data=b'{"front_dir_path": 1}')
+        assert error.value.code == 400
+
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,16 +1,28 @@
-from enum import Enum
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import contextlib
+import ctypes
+import functools
+import io
 import itertools
 import json
 import math
 import os
 from pathlib import Path
 import re
-from typing import Dict, List
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Set
 from xml.dom import ValidationErr
 
+from caches import ImageCache, IngestStore, OutputCache, cache_directory, get_cache_key, get_file_stat, hash_file, template_cache_version, tile_cache_version
+import click
+from enums import CardSize, ImageFormat, PaperSize, PdfEngine, RenderPreset
 from natsort import natsorted
-from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageOps
-from pydantic import BaseModel
+from PIL import ExifTags, Image, ImageColor, ImageDraw, ImageFont, ImageOps, PdfParser
+from pydantic import BaseModel, ConfigDict, ValidationError
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
 
 # Specify directory locations
 asset_directory = 'assets'
@@ -18,24 +30,23 @@ asset_directory = 'assets'
 layouts_filename = 'layouts.json'
 layouts_path = os.path.join(asset_directory, layouts_filename)
 
-class CardSize(str, Enum):
-    STANDARD = "standard"
-    STANDARD_DOUBLE = "standard_double"
-    JAPANESE = "japanese"
-    POKER = "poker"
-    POKER_HALF = "poker_half"
-    BRIDGE = "bridge"
-    BRIDGE_SQUARE = "bridge_square"
-    TAROT = "tarot"
-    DOMINO = "domino"
-    DOMINO_SQUARE = "domino_square"
-
-class PaperSize(str, Enum):
-    LETTER = "letter"
-    TABLOID = "tabloid"
-    A4 = "a4"
-    A3 = "a3"
-    ARCHB = "archb"
+# Bump this when the way pages are drawn or written changes, so pages of an older output are not reused
+page_manifest_version = 2
+
+# Bump this when what a scan records about each image changes, so older scans are probed again
+scan_manifest_version = 1
+scan_cache_directory = os.path.join(cache_directory, 'scans')
+
+# Images whose aspect ratio differs from the card by more than this are reported as stretched,
+# and images smaller than this fraction of their slot are reported as upscaled
+max_aspect_ratio_difference = 0.02
+min_resolution_ratio = 0.9
+
+# WebP can't encode images wider or taller than this many pixels
+max_webp_size = 16383
+
+# The direct engine scales card images down to the PPI once they're larger than this many times their slot
+max_direct_image_scale = 1.5
 
 class CardLayoutSize(BaseModel):
     width: int
@@ -55,6 +66,37 @@ class Layouts(BaseModel):
     card_sizes: Dict[CardSize, CardLayoutSize]
     paper_layouts: Dict[PaperSize, PaperLayout]
 
+class OffsetData(BaseModel):
+    # Frozen so that offsets can key cached registration images
+    model_config = ConfigDict(frozen=True)
+
+    # Offsets are in pixels at 300 PPI, and may be fractional
+    x_offset: float
+    y_offset: float
+
+    # Rotation in degrees, counterclockwise, around the center of the page
+    angle: float = 0
+
+class RenderSettings(BaseModel):
+    # Filter used to scale card images, None for the Pillow default of BICUBIC
+    resample: Image.Resampling | None
+
+    # Images at least this many times larger than their tile are first reduced by a whole factor, None to scale in one step
+    reducing_gap: float | None
+
+    # JPEG chroma subsampling, 0 keeps the full color resolution and 2 halves it
+    subsampling: int
+
+    # Decode images much larger than their tile at a reduced scale
+    prescale: bool
+
+# Trade quality for speed, "print" draws exactly as before presets existed
+render_presets = {
+    RenderPreset.DRAFT: RenderSettings(resample=Image.Resampling.BILINEAR, reducing_gap=2.0, subsampling=2, prescale=True),
+    RenderPreset.BALANCED: RenderSettings(resample=Image.Resampling.BICUBIC, reducing_gap=3.0, subsampling=0, prescale=True),
+    RenderPreset.PRINT: RenderSettings(resample=None, reducing_gap=None, subsampling=0, prescale=False)
+}
+
 # Known junk files across OSes
 EXTRANEOUS_FILES = {
     ".DS_Store",
@@ -63,6 +105,166 @@ EXTRANEOUS_FILES = {
     "Icon\r",  # macOS oddball
 }
 
+class Profiler:
+    """
+    Records the time spent in each stage of a render. Stages nest, so a
+    stage is recorded under the stack of stages it ran in. The stages that
+    run while a card is being processed are also added up for that card.
+
+    Each thread has its own stack, so stages of background threads, such as
+    the page encoders, are recorded at the top level.
+    """
+
+    def __init__(self):
+        # Number of calls and total seconds, keyed by stack of stage names
+        self.stages: Dict[tuple[str, ...], list] = {}
+
+        # Seconds per stage, keyed by card image path
+        self.cards: Dict[str, Dict[str, float]] = {}
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+            self._local.card = None
+
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def stage(self, name: str, card: str | None = None):
+        stack = self._stack
+        outer_card = self._local.card
+        if card is not None:
+            self._local.card = card
+
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._record(tuple(stack), 1, elapsed)
+
+            if self._local.card is not None:
+                with self._lock:
+                    card_stages = self.cards.setdefault(self._local.card, {})
+                    card_stages[name] = card_stages.get(name, 0) + elapsed
+
+            stack.pop()
+            self._local.card = outer_card
+
+    def _record(self, stack: tuple[str, ...], calls: int, seconds: float):
+        with self._lock:
+            totals = self.stages.setdefault(stack, [0, 0.0])
+            totals[0] += calls
+            totals[1] += seconds
+
+    def get_records(self) -> dict:
+        return {
+            'stages': [(stack, calls, seconds) for stack, (calls, seconds) in self.stages.items()],
+            'cards': self.cards
+        }
+
+    def merge(self, records: dict):
+        """
+        Adds records from another process, such as a sheet composed by a
+        worker, under the stage that is currently running.
+        """
+        for stack, calls, seconds in records['stages']:
+            self._record(tuple(self._stack) + tuple(stack), calls, seconds)
+
+        with self._lock:
+            for card, card_stages in records['cards'].items():
+                totals = self.cards.setdefault(card, {})
+                for name, seconds in card_stages.items():
+                    totals[name] = totals.get(name, 0) + seconds
+
+    def write_reports(self, report_dir: str):
+        """
+        Writes profile.json, with the cumulative and per-card timings, and
+        profile.folded, with the time spent in each stack itself in
+        microseconds, which flame graph tools such as flamegraph.pl and
+        speedscope can read.
+        """
+        child_seconds: Dict[tuple[str, ...], float] = {}
+        for stack, (_, seconds) in self.stages.items():
+            if len(stack) > 1:
+                child_seconds[stack[:-1]] = child_seconds.get(stack[:-1], 0) + seconds
+
+        stages = []
+        totals: Dict[str, list] = {}
+        for stack, (calls, seconds) in sorted(self.stages.items()):
+            self_seconds = max(seconds - child_seconds.get(stack, 0), 0)
+            stages.append({'stack': list(stack), 'calls': calls, 'seconds': seconds, 'self_seconds': self_seconds})
+
+            # The same stage can run under different stacks
+            stage_totals = totals.setdefault(stack[-1], [0, 0.0])
+            stage_totals[0] += calls
+            stage_totals[1] += seconds
+
+        report = {
+            'totals': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in sorted(totals.items(), key=lambda item: -item[1][1])},
+            'stages': stages,
+            'cards': self.cards
+        }
+
+        os.makedirs(report_dir, exist_ok=True)
+
+        with open(os.path.join(report_dir, 'profile.json'), 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+
+        with open(os.path.join(report_dir, 'profile.folded'), 'w') as folded_file:
+            for stage in stages:
+                microseconds = round(stage['self_seconds'] * 1000000)
+                if microseconds > 0:
+                    folded_file.write(f'{";".join(stage["stack"])} {microseconds}\n')
+
+# The profiler of the current render, only set while profiling
+profiler: Profiler | None = None
+
+# Reused whenever profiling is off, so that stages cost next to nothing
+no_profile_stage = contextlib.nullcontext()
+
+def profile_stage(name: str, card: str | None = None):
+    if profiler is None:
+        return no_profile_stage
+
+    return profiler.stage(name, card)
+
+def profiled(name: str):
+    # Records every call of the decorated function as a stage
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with profile_stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+@contextlib.contextmanager
+def profile_render(report_dir: str | None):
+    """
+    Profiles everything run inside of it and writes the reports to
+    report_dir. Does nothing when report_dir is None.
+    """
+    global profiler
+    if report_dir is None:
+        yield
+        return
+
+    profiler = Profiler()
+    try:
+        yield
+        profiler.write_reports(report_dir)
+        print(f'Generated profile: {os.path.join(report_dir, "profile.json")}')
+    finally:
+        profiler = None
+
 def parse_crop_string(crop_string: str | None, card_width: int, card_height: int) -> tuple[float, float]:
     """
     Calculates crop based on various formats.
@@ -126,25 +328,163 @@ def get_directory(path):
     else:
         return os.path.abspath(os.path.dirname(path))
 
-def get_image_file_paths(dir_path: str) -> List[str]:
-    result = []
+class ImageProbe(BaseModel):
+    # Path relative to the scanned directory
+    path: str
 
-    for current_folder, _, files in os.walk(dir_path):
-        for filename in files:
-            # Skip files that end with .md
-            if filename.endswith(".md"):
-                continue
+    # Size and modification time of the file when it was probed
+    size: int
+    mtime_ns: int
 
-            full_path = os.path.join(current_folder, filename)
-            relative_path = os.path.relpath(full_path, dir_path)
-            result.append(relative_path)
+    # What the image header says, format is None for files that can't be opened as images
+    format: str | None = None
+    width: int = 0
+    height: int = 0
+    mode: str | None = None
+    orientation: int = 1
 
-    return result
+    # Whether the whole image was decoded without errors by a preflight check
+    verified: bool = False
 
-def get_back_card_image_path(back_dir_path) -> str | None:
+    @property
+    def upright_size(self) -> tuple[int, int]:
+        # The size once the EXIF orientation is applied
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+
+        return self.width, self.height
+
+class ScanManifest(BaseModel):
+    version: int = scan_manifest_version
+
+    # Probe of every image of the directory, by relative path
+    images: Dict[str, ImageProbe]
+
+def get_scan_manifest_path(dir_path: str) -> str:
+    return os.path.join(scan_cache_directory, f'{get_cache_key(os.path.abspath(dir_path))}.json')
+
+def load_scan_manifest(manifest_path: str) -> Dict[str, ImageProbe]:
+    try:
+        # Validating the JSON directly is much faster for the thousands of entries of a large deck
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = ScanManifest.model_validate_json(manifest_file.read())
+    except (OSError, ValidationError):
+        return {}
+
+    if manifest.version != scan_manifest_version:
+        return {}
+
+    return manifest.images
+
+def save_scan_manifest(manifest_path: str, images: Dict[str, ImageProbe]):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+
+    # Write to a temporary file first so that other processes never read a partial manifest
+    temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as manifest_file:
+        manifest_file.write(ScanManifest(images=images).model_dump_json())
+    os.replace(temp_path, manifest_path)
+
+def iter_directory_files(dir_path: str, relative_dir: str = '') -> Iterator[tuple[str, int, int]]:
+    """
+    Yields the relative path, size and modification time of every file in
+    dir_path and its subdirectories, except markdown files. Like os.walk,
+    symlinked directories are not followed and unreadable directories are
+    skipped.
+    """
+    try:
+        entries = list(os.scandir(os.path.join(dir_path, relative_dir)))
+    except OSError:
+        return
+
+    for entry in entries:
+        relative_path = os.path.join(relative_dir, entry.name)
+
+        if entry.is_dir():
+            if not entry.is_symlink():
+                yield from iter_directory_files(dir_path, relative_path)
+            continue
+
+        # The directory may contain markdown files
+        if entry.name.endswith('.md'):
+            continue
+
+        try:
+            stat = entry.stat()
+        except OSError:
+            # Broken links are still listed, so that they are reported rather than silently skipped
+            yield relative_path, -1, -1
+            continue
+
+        yield relative_path, stat.st_size, stat.st_mtime_ns
+
+def get_header_orientation(image: Image.Image) -> int:
+    # PNG images only have their EXIF data in the header when it comes before the pixels,
+    # getexif would decode the whole image to look for it
+    if image.format == 'PNG' and 'exif' not in image.info:
+        return 1
+
+    return image.getexif().get(ExifTags.Base.Orientation, 1)
+
+def probe_image(dir_path: str, relative_path: str, size: int, mtime_ns: int) -> ImageProbe:
+    # Opening an image only reads its header, the pixels are never decoded here
+    try:
+        with Image.open(os.path.join(dir_path, relative_path)) as image:
+            return ImageProbe(
+                path=relative_path,
+                size=size,
+                mtime_ns=mtime_ns,
+                format=image.format,
+                width=image.width,
+                height=image.height,
+                mode=image.mode,
+                orientation=get_header_orientation(image)
+            )
+    except Exception:
+        # Anything that isn't a readable image is recorded without a format
+        return ImageProbe(path=relative_path, size=size, mtime_ns=mtime_ns)
+
+def scan_image_directory(dir_path: str) -> List[ImageProbe]:
+    """
+    Lists the images in dir_path and its subdirectories in natural order,
+    along with their format, size, mode and EXIF orientation. Only the
+    headers of new or modified files are read, everything else comes from
+    the manifest of the previous scan, so scanning an unchanged directory
+    only lists it.
+    """
+    manifest_path = get_scan_manifest_path(dir_path)
+    previous_images = load_scan_manifest(manifest_path)
+
+    images = {}
+    for relative_path, size, mtime_ns in iter_directory_files(dir_path):
+        probe = previous_images.get(relative_path)
+        if probe is None or (probe.size, probe.mtime_ns) != (size, mtime_ns) or size < 0:
+            probe = probe_image(dir_path, relative_path, size, mtime_ns)
+
+        images[relative_path] = probe
+
+    # The manifest keeps the images in natural order, so they are only sorted again when files are added or removed
+    if images.keys() == previous_images.keys():
+        images = {path: images[path] for path in previous_images}
+    else:
+        images = {path: images[path] for path in natsorted(images)}
+
+    if images != previous_images:
+        save_scan_manifest(manifest_path, images)
+
+    return list(images.values())
+
+def get_image_file_paths(dir_path: str) -> List[str]:
+    # Relative paths, in natural order
+    return [probe.path for probe in scan_image_directory(dir_path)]
+
+def get_back_card_image_files(back_dir_path) -> List[str]:
     # List all files in the directory that do not end with .md
     # The directory may contain markdown files
-    files = [f for f in os.listdir(back_dir_path) if (os.path.isfile(os.path.join(back_dir_path, f)) and not f.endswith(".md"))]
+    return [f for f in os.listdir(back_dir_path) if (os.path.isfile(os.path.join(back_dir_path, f)) and not f.endswith(".md"))]
+
+def get_back_card_image_path(back_dir_path) -> str | None:
+    files = get_back_card_image_files(back_dir_path)
 
     if len(files) == 0:
         return None
@@ -168,6 +508,159 @@ def get_back_card_image_path(back_dir_path) -> str | None:
 
     return os.path.join(back_dir_path, files[index])
 
+class PreflightReport(BaseModel):
+    num_images: int = 0
+
+    # Problems that stop a render, such as images that can't be decoded
+    errors: List[str] = []
+
+    # Problems that are drawn anyway, such as images that are stretched to fit the card
+    warnings: List[str] = []
+
+def verify_card_image(image_path: str) -> str | None:
+    # Decodes the whole image, truncated files only fail once the missing pixels are reached
+    try:
+        with Image.open(image_path) as image:
+            image.load()
+    except Exception as e:
+        return str(e) or type(e).__name__
+
+    return None
+
+def verify_card_images(dir_paths: Iterable[str], image_paths: Set[str], jobs: int = 1) -> Dict[str, str]:
+    """
+    Decodes the images of image_paths, which are in the directories of
+    dir_paths, and returns the error of each image that can't be decoded.
+    Images that pass are recorded in the scan manifests, so they're only
+    decoded again once they change. Decoding is slow, so it's done in
+    parallel with more than one job.
+    """
+    scans = {dir_path: scan_image_directory(dir_path) for dir_path in dir_paths}
+    unverified = {}
+    for dir_path, probes in scans.items():
+        for probe in probes:
+            image_path = os.path.join(dir_path, probe.path)
+            if image_path in image_paths and not probe.verified:
+                unverified[image_path] = (dir_path, probe)
+
+    decode_errors = {}
+    verified_dirs = set()
+
+    def record(image_path: str, error: str | None):
+        dir_path, probe = unverified[image_path]
+        if error is None:
+            probe.verified = True
+            verified_dirs.add(dir_path)
+        else:
+            decode_errors[image_path] = error
+
+    if jobs <= 1 or len(unverified) <= 1:
+        for image_path in unverified:
+            record(image_path, verify_card_image(image_path))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(unverified))) as executor:
+            futures = {executor.submit(verify_card_image, image_path): image_path for image_path in unverified}
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
+    for dir_path in verified_dirs:
+        save_scan_manifest(get_scan_manifest_path(dir_path), {probe.path: probe for probe in scans[dir_path]})
+
+    return decode_errors
+
+def get_stretch(image_width: float, image_height: float, width: int, height: int) -> float:
+    # How much the image is widened, or narrowed when negative, to fit the card
+    return (image_width / image_height) / (width / height) - 1
+
+def check_card_images(
+    front_dir_path: str,
+    back_dir_path: str,
+    double_sided_dir_path: str,
+    only_fronts: bool,
+    card_size: CardSize,
+    width: int,
+    height: int,
+    crop: tuple[float, float],
+    ppi: int | None,
+    jobs: int = 1,
+    verify: bool = False
+) -> PreflightReport:
+    """
+    Checks every card image before anything is rendered. Files that aren't
+    images and double-sided backs without a front are errors, images that
+    are stretched to fit the card, or upscaled to fit it at ppi, are
+    warnings. Only the image headers of the last scan are used, unless
+    verify is set, in which case images are also decoded to find the ones
+    that are damaged.
+    """
+    report = PreflightReport()
+    scans = {dir_path: scan_image_directory(dir_path) for dir_path in (front_dir_path, double_sided_dir_path, back_dir_path)}
+
+    front_files = {probe.path for probe in scans[front_dir_path]}
+    for probe in scans[double_sided_dir_path]:
+        if probe.path not in front_files:
+            report.errors.append(f'Double-sided back "{probe.path}" does not have a matching front. Add the missing front to front image directory "{front_dir_path}".')
+
+    if only_fronts and len(scans[double_sided_dir_path]) > 0:
+        report.errors.append(f'Cannot use "--only_fronts" with double-sided cards. Remove cards from double-side image directory "{double_sided_dir_path}".')
+
+    # Fronts and double-sided backs are cropped, the back of single-sided cards is not
+    back_files = set() if only_fronts else set(get_back_card_image_files(back_dir_path))
+    images = [(front_dir_path, probe, crop) for probe in scans[front_dir_path]]
+    images += [(double_sided_dir_path, probe, crop) for probe in scans[double_sided_dir_path]]
+    images += [(back_dir_path, probe, (0, 0)) for probe in scans[back_dir_path] if probe.path in back_files]
+    report.num_images = len(images)
+
+    decode_errors = {}
+    if verify:
+        decode_errors = verify_card_images(scans.keys(), {os.path.join(dir_path, probe.path) for dir_path, probe, _ in images}, jobs)
+
+    for dir_path, probe, image_crop in images:
+        image_path = os.path.join(dir_path, probe.path)
+        if image_path in decode_errors:
+            report.errors.append(f'Cannot decode "{image_path}": {decode_errors[image_path]}')
+            continue
+
+        if probe.format is None:
+            report.errors.append(f'Cannot open "{image_path}" as an image.')
+            continue
+
+        # The part of the image that is drawn on the card
+        image_width, image_height = probe.upright_size
+        crop_x_percent, crop_y_percent = image_crop
+        drawn_width = image_width * (1 - crop_x_percent / 100)
+        drawn_height = image_height * (1 - crop_y_percent / 100)
+
+        if drawn_width < 1 or drawn_height < 1:
+            report.errors.append(f'"{image_path}" is {image_width}x{image_height} pixels and nothing of it is left after cropping {crop_x_percent:g}% by {crop_y_percent:g}%.')
+            continue
+
+        # Cropping the same length from every side changes the aspect ratio of images without print bleed a little,
+        # so an image is only stretched when it doesn't fit the card either with or without the crop
+        stretch = get_stretch(drawn_width, drawn_height, width, height)
+        if abs(stretch) > max_aspect_ratio_difference and abs(get_stretch(image_width, image_height, width, height)) > max_aspect_ratio_difference:
+            report.warnings.append(f'"{image_path}" is {image_width}x{image_height} pixels and is stretched by {abs(stretch):.0%} to fit a {card_size} card.')
+
+        if ppi is not None:
+            slot_width = width * ppi / 300
+            slot_height = height * ppi / 300
+            if drawn_width < slot_width * min_resolution_ratio or drawn_height < slot_height * min_resolution_ratio:
+                report.warnings.append(f'"{image_path}" is {image_width}x{image_height} pixels and is upscaled to {round(slot_width)}x{round(slot_height)} at {ppi} PPI.')
+
+    return report
+
+def print_preflight_report(report: PreflightReport):
+    # Every problem is listed before the render is stopped, so they can all be fixed at once
+    for warning in report.warnings:
+        print(f'Warning: {warning}')
+
+    for error in report.errors:
+        print(f'Error: {error}')
+
+    if len(report.errors) > 0:
+        raise Exception(f'Found {len(report.errors)} problem{"s" if len(report.errors) != 1 else ""} with the card images, nothing was rendered.')
+
+@profiled('bleed')
 def draw_card_with_bleed(card_image: Image, base_image: Image, box: tuple[int, int, int, int], print_bleed: tuple[int, int]):
     origin_x, origin_y, _, _ = box
 
@@ -177,39 +670,213 @@ def draw_card_with_bleed(card_image: Image, base_image: Image, box: tuple[int, i
     width, height = card_image.size
     base_image.paste(card_image, (origin_x, origin_y))
 
-    class Axis(int, Enum):
-        X = 0
-        Y = 1
+    # Anything past the edge of the page would be clipped by paste anyway,
+    # so only stretch the edges as far as the page allows
+    left_bleed = max(0, min(x_bleed, origin_x))
+    right_bleed = max(0, min(x_bleed, base_image.width - origin_x - width))
+    top_bleed = max(0, min(y_bleed, origin_y))
+    bottom_bleed = max(0, min(y_bleed, base_image.height - origin_y - height))
 
-    def extend_edge(crop_box: tuple[int, int, int, int], start: tuple[int, int], bleed: int, axis: Axis):
-        for bleed_i in range(bleed):
-            pos = (
-                start[0] + (bleed_i if axis == Axis.X else 0),
-                start[1] + (bleed_i if axis == Axis.Y else 0)
-            )
+    def extend_edge(crop_box: tuple[int, int, int, int], pos: tuple[int, int], size: tuple[int, int]):
+        if size[0] <= 0 or size[1] <= 0:
+            return
 
-            base_image.paste(card_image.crop(crop_box), pos)
+        # Stretching a 1 pixel strip with nearest neighbor repeats it exactly
+        edge = card_image.crop(crop_box).resize(size, Image.Resampling.NEAREST)
+        base_image.paste(edge, pos)
 
     # Extend the edges of the cards to create print bleed
     # Top and bottom
-    extend_edge((0, 0, width, 1), (origin_x, origin_y - y_bleed), y_bleed, Axis.Y)
-    extend_edge((0, height - 1, width, height), (origin_x, origin_y + height), y_bleed, Axis.Y)
+    extend_edge((0, 0, width, 1), (origin_x, origin_y - top_bleed), (width, top_bleed))
+    extend_edge((0, height - 1, width, height), (origin_x, origin_y + height), (width, bottom_bleed))
 
     # Left and right
-    extend_edge((0, 0, 1, height), (origin_x - x_bleed, origin_y), x_bleed, Axis.X)
-    extend_edge((width - 1, 0, width, height), (origin_x + width, origin_y), x_bleed, Axis.X)
+    extend_edge((0, 0, 1, height), (origin_x - left_bleed, origin_y), (left_bleed, height))
+    extend_edge((width - 1, 0, width, height), (origin_x + width, origin_y), (right_bleed, height))
 
     # Corners
-    for x_bleed, crop_x, pos_x in [(x_bleed, 0, origin_x - x_bleed), (x_bleed, width - 1, origin_x + width)]:
-        for y_bleed, crop_y, pos_y in [(y_bleed, 0, origin_y - y_bleed), (y_bleed, height - 1, origin_y + height)]:
-            for x_bleed_i in range(x_bleed):
-                for y_bleed_i in range(y_bleed):
-                    base_image.paste(card_image.crop((crop_x, crop_y, crop_x + 1, crop_y + 1)), (pos_x + x_bleed_i, pos_y + y_bleed_i))
+    for x_bleed, crop_x, pos_x in [(left_bleed, 0, origin_x - left_bleed), (right_bleed, width - 1, origin_x + width)]:
+        for y_bleed, crop_y, pos_y in [(top_bleed, 0, origin_y - top_bleed), (bottom_bleed, height - 1, origin_y + height)]:
+            extend_edge((crop_x, crop_y, crop_x + 1, crop_y + 1), (pos_x, pos_y), (x_bleed, y_bleed))
+
+    return base_image
+
+def draw_offset_card_with_bleed(card_image: Image, base_image: Image, box: tuple[int, int, int, int], print_bleed: tuple[int, int], offset: OffsetData, ppi_ratio: float):
+    """
+    Draws a card with print bleed where it lands once the page is moved by
+    offset. Moves by whole pixels only change where the card is drawn,
+    other moves resample the card and its bleed on their own rather than
+    the whole page.
+    """
+    origin_x, origin_y, _, _ = box
+    x_offset = offset.x_offset * ppi_ratio
+    y_offset = offset.y_offset * ppi_ratio
+
+    if offset.angle == 0 and x_offset.is_integer() and y_offset.is_integer():
+        return draw_card_with_bleed(card_image, base_image, (origin_x + int(x_offset), origin_y + int(y_offset), *box[2:]), print_bleed)
+
+    # Draw the card with as much bleed as the page has room for
+    width, height = card_image.size
+    left = max(0, origin_x - print_bleed[0])
+    top = max(0, origin_y - print_bleed[1])
+    right = min(base_image.width, origin_x + width + print_bleed[0])
+    bottom = min(base_image.height, origin_y + height + print_bleed[1])
+
+    card_with_bleed = Image.new(base_image.mode, (right - left, bottom - top))
+    draw_card_with_bleed(card_image, card_with_bleed, (origin_x - left, origin_y - top, *box[2:]), print_bleed)
+
+    moved, position = move_image(card_with_bleed, (left, top), base_image.size, x_offset, y_offset, offset.angle)
+    base_image.paste(moved, position, moved)
 
     return base_image
 
+def get_tile_key(image_hash: str, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset = RenderPreset.PRINT) -> str:
+    # A crop of 0 and 0.0 is the same tile
+    crop = tuple(float(value) for value in crop)
+    return get_cache_key('tile', tile_cache_version, image_hash, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+
+def create_card_tile(card_image: Image.Image, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset = RenderPreset.PRINT) -> Image.Image:
+    settings = render_presets[preset]
+
+    if flip:
+        # Rotate the back image to account for orientation, a transpose moves pixels without resampling them
+        with profile_stage('rotate'):
+            card_image = card_image.transpose(Image.Transpose.ROTATE_180)
+
+    # Crop the outer portion of a card to remove preexisting print bleed
+    crop_x_percent, crop_y_percent = crop
+    if crop_x_percent > 0 or crop_y_percent > 0:
+        card_width, card_height = card_image.size
+        card_width_crop = math.floor(card_width / 2 * (crop_x_percent / 100))
+        card_height_crop = math.floor(card_height / 2 * (crop_y_percent / 100))
+
+        with profile_stage('crop'):
+            card_image = card_image.crop((
+                card_width_crop,
+                card_height_crop,
+                card_width - card_width_crop,
+                card_height - card_height_crop
+            ))
+
+    # Resize the image to normalize extend_corners
+    with profile_stage('resize'):
+        card_image = card_image.resize((math.floor(width * ppi_ratio), math.floor(height * ppi_ratio)), settings.resample, reducing_gap=settings.reducing_gap)
+
+    extend_corners_ppi = math.floor(extend_corners * ppi_ratio)
+    with profile_stage('extend corners'):
+        return card_image.crop((extend_corners_ppi, extend_corners_ppi, card_image.width - extend_corners_ppi, card_image.height - extend_corners_ppi))
+
+# Tiles of images that appear more than once in a render, shared between the pages of a process
+shared_tiles: OrderedDict[str, Image.Image] = OrderedDict()
+shared_tiles_max_size = 256 * 1024 * 1024
+
+def add_shared_tile(key: str, card_tile: Image.Image):
+    shared_tiles[key] = card_tile
+
+    # Drop the least recently used tiles once the limit is reached
+    def get_size(tile: Image.Image) -> int:
+        return tile.width * tile.height * len(tile.getbands())
+
+    total_size = sum(get_size(tile) for tile in shared_tiles.values())
+    while total_size > shared_tiles_max_size and len(shared_tiles) > 1:
+        _, oldest_tile = shared_tiles.popitem(last=False)
+        total_size -= get_size(oldest_tile)
+
+class CardTiles:
+    """
+    Provides the tile for each card image of a page. A tile is reused, in
+    order, from earlier slots on the same page, from tiles shared between
+    pages for images in shared_hashes, from the on-disk image cache, and
+    from the tiles made by ingest.py. Images are only loaded and processed
+    when none of these have the tile.
+
+    image_hashes maps image paths to the hashes of their contents, so that
+    identical images under different paths are processed only once.
+
+    Once the slots of a page are planned with plan_page, each tile is only
+    kept until the last slot that uses it, so a page holds no more tiles
+    than it still needs.
+    """
+
+    def __init__(self, image_cache: ImageCache | None = None, image_hashes: Dict[str, str] | None = None, shared_hashes: Set[str] | None = None):
+        self.image_cache = image_cache
+        self.image_hashes = image_hashes if image_hashes is not None else {}
+        self.shared_hashes = shared_hashes if shared_hashes is not None else set()
+        self.ingest_store = IngestStore()
+
+        self.page_tiles: Dict[str, Image.Image] = {}
+        self.page_uses: Counter[str] | None = None
+
+    def _get_image_hash(self, image_path: str) -> str | None:
+        # Hashing is only worth it when the tile may be found outside this page
+        image_hash = self.image_hashes.get(image_path)
+        if image_hash is None and self.image_cache is not None:
+            with profile_stage('hash'):
+                image_hash = hash_file(image_path)
+
+        return image_hash
+
+    def plan_page(self, image_paths: Iterable[str]):
+        # Counts how many slots of the page use each tile
+        self.page_uses = Counter()
+        for image_path in image_paths:
+            image_hash = self._get_image_hash(image_path)
+            self.page_uses[image_hash if image_hash is not None else image_path] += 1
+
+    def get(self, image_path: str, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset = RenderPreset.PRINT) -> Image.Image:
+        image_hash = self._get_image_hash(image_path)
+        page_key = image_hash if image_hash is not None else image_path
+
+        card_tile = self.page_tiles.get(page_key)
+        if card_tile is None:
+            card_tile = self._load(image_path, image_hash, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+
+        if self.page_uses is None or self.page_uses[page_key] > 1:
+            self.page_tiles[page_key] = card_tile
+        else:
+            # No other slot of the page needs the tile
+            self.page_tiles.pop(page_key, None)
+
+        if self.page_uses is not None:
+            self.page_uses[page_key] -= 1
+
+        return card_tile
+
+    def _load(self, image_path: str, image_hash: str | None, width: int, height: int, crop: tuple[float, float], ppi_ratio: float, extend_corners: int, flip: bool, preset: RenderPreset) -> Image.Image:
+        # The card image is decoded only when no cache has its tile, and released once the tile is made
+        card_tile = None
+        key = None
+        if image_hash is not None:
+            key = get_tile_key(image_hash, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+
+            if key in shared_tiles:
+                shared_tiles.move_to_end(key)
+                card_tile = shared_tiles[key]
+            elif self.image_cache is not None:
+                with profile_stage('cache read'):
+                    card_tile = self.image_cache.get(key)
+
+        if card_tile is None:
+            # Ingested tiles are used whether or not the cache is enabled
+            with profile_stage('ingest read'):
+                card_tile = self.ingest_store.get(image_path, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+
+        if card_tile is None:
+            # Tiles are always pasted onto an RGB page, so store them that way
+            card_image = load_card_image(image_path, get_min_card_image_size(width, height, crop, ppi_ratio, preset))
+            card_tile = create_card_tile(card_image, width, height, crop, ppi_ratio, extend_corners, flip, preset).convert('RGB')
+
+            if self.image_cache is not None:
+                with profile_stage('cache write'):
+                    self.image_cache.put(key, card_tile)
+
+        if image_hash in self.shared_hashes:
+            add_shared_tile(key, card_tile)
+
+        return card_tile
+
 def draw_card_layout(
-    card_images: List[Image.Image | None],
+    card_images: List[Image.Image | str | None],
     base_image: Image.Image,
     num_rows: int,
     num_cols: int,
@@ -221,10 +888,26 @@ def draw_card_layout(
     crop: tuple[float, float],
     ppi_ratio: float,
     extend_corners: int,
-    flip: bool
+    flip: bool,
+    card_tiles: CardTiles | None = None,
+    offset: OffsetData | None = None,
+    preset: RenderPreset = RenderPreset.PRINT
 ):
+    """
+    Draws cards into their slots on the base image. Cards can be given as
+    images or as image paths. The tiles for paths come from card_tiles, so
+    a path is only loaded when its tile has not been processed already.
+
+    With an offset, the cards are drawn where they would be if the whole
+    base image were moved by it.
+    """
     num_cards = num_rows * num_cols
 
+    if card_tiles is None:
+        card_tiles = CardTiles()
+
+    card_tiles.plan_page(card_image for card_image in card_images if isinstance(card_image, str))
+
     # Fill all the spaces with the card back
     for i, card_image in enumerate(card_images):
         if card_image is None:
@@ -237,57 +920,505 @@ def draw_card_layout(
         if flip:
             new_origin_y = math.floor(y_pos[num_rows - ((i % num_cards) // num_cols) - 1] * ppi_ratio)
 
-            # Rotate the back image to account for orientation
-            card_image = card_image.rotate(180)
+        # Stages are added up per card for cards given as paths
+        with profile_stage('card', card_image if isinstance(card_image, str) else None):
+            if isinstance(card_image, str):
+                card_tile = card_tiles.get(card_image, width, height, crop, ppi_ratio, extend_corners, flip, preset)
+            else:
+                card_tile = create_card_tile(card_image, width, height, crop, ppi_ratio, extend_corners, flip, preset)
 
-        # Crop the outer portion of a card to remove preexisting print bleed
-        crop_x_percent, crop_y_percent = crop
-        if crop_x_percent > 0 or crop_y_percent > 0:
-            card_width, card_height = card_image.size
-            card_width_crop = math.floor(card_width / 2 * (crop_x_percent / 100))
-            card_height_crop = math.floor(card_height / 2 * (crop_y_percent / 100))
+            extend_corners_ppi = math.floor(extend_corners * ppi_ratio)
+            box = (new_origin_x + extend_corners_ppi, new_origin_y + extend_corners_ppi, math.floor(width * ppi_ratio) - (2 * extend_corners_ppi), math.floor(height * ppi_ratio) - (2 * extend_corners_ppi))
+            card_print_bleed = tuple(math.ceil(bleed * ppi_ratio) + extend_corners_ppi for bleed in print_bleed)
 
-            card_image = card_image.crop((
-                card_width_crop,
-                card_height_crop,
-                card_width - card_width_crop,
-                card_height - card_height_crop
-            ))
+            if offset is None:
+                draw_card_with_bleed(card_tile, base_image, box, card_print_bleed)
+            else:
+                draw_offset_card_with_bleed(card_tile, base_image, box, card_print_bleed, offset, ppi_ratio)
 
-        # Resize the image to normalize extend_corners
-        card_image = card_image.resize((math.floor(width * ppi_ratio), math.floor(height * ppi_ratio)))
+def load_layouts() -> Layouts:
+    # layouts.json is only parsed and validated again when it changes
+    stat = os.stat(layouts_path)
+    layouts = parse_layouts(layouts_path, stat.st_mtime_ns, stat.st_size)
 
-        extend_corners_ppi = math.floor(extend_corners * ppi_ratio)
-        card_image = card_image.crop((extend_corners_ppi, extend_corners_ppi, card_image.width - extend_corners_ppi, card_image.height - extend_corners_ppi))
+    # Callers may sort the card positions, so don't hand out the cached copy
+    return layouts.model_copy(deep=True)
 
-        draw_card_with_bleed(
-            card_image,
-            base_image,
-            (new_origin_x + extend_corners_ppi, new_origin_y + extend_corners_ppi, math.floor(width * ppi_ratio) - (2 * extend_corners_ppi), math.floor(height * ppi_ratio) - (2 * extend_corners_ppi)),
-            tuple(math.ceil(bleed * ppi_ratio) + extend_corners_ppi for bleed in print_bleed)
-        )
+@functools.lru_cache(maxsize=1)
+def parse_layouts(path: str, mtime_ns: int, size: int) -> Layouts:
+    with open(path, 'r') as layouts_file:
+        try:
+            layouts_data = json.load(layouts_file)
+            return Layouts(**layouts_data)
 
-def add_front_back_pages(front_page: Image.Image, back_page: Image.Image, pages: List[Image.Image], page_width: int, page_height: int, ppi_ratio: float, template: str, only_fronts: bool, name: str):
-    # Add template version number to the back
-    draw = ImageDraw.Draw(front_page)
-    font = ImageFont.truetype(os.path.join(asset_directory, 'arial.ttf'), 40 * ppi_ratio)
+        except ValidationError as e:
+            raise Exception(f'Cannot parse layouts.json: {e}.')
 
-    # "Raw" specified location
-    num_sheet = len(pages) + 1
+def get_sheet_label(page_count: int, template: str, only_fronts: bool, name: str) -> str:
+    num_sheet = page_count + 1
     if not only_fronts:
-        num_sheet = int(len(pages) / 2) + 1
+        num_sheet = int(page_count / 2) + 1
 
     label = f'sheet: {num_sheet}, template: {template}'
     if name is not None:
         label = f'name: {name}, {label}'
 
-    draw.text((math.floor((page_width - 180) * ppi_ratio), math.floor((page_height - 140) * ppi_ratio)), label, fill = (0, 0, 0), anchor="ra", font=font)
+    return label
+
+@functools.cache
+def load_label_font(size: float) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(os.path.join(asset_directory, 'arial.ttf'), size)
+
+def add_front_back_pages(front_page: Image.Image, back_page: Image.Image, pages: 'PageWriter', page_width: int, page_height: int, ppi_ratio: float, template: str, only_fronts: bool, name: str):
+    # Add template version number to the back
+    with profile_stage('label'):
+        draw = ImageDraw.Draw(front_page)
+        font = load_label_font(40 * ppi_ratio)
+
+        # "Raw" specified location
+        label = get_sheet_label(pages.page_count, template, only_fronts, name)
+
+        draw.text((math.floor((page_width - 180) * ppi_ratio), math.floor((page_height - 140) * ppi_ratio)), label, fill = (0, 0, 0), anchor="ra", font=font)
 
     # Add a back page for every front page template
-    pages.append(front_page)
+    pages.add_page(front_page)
     if not only_fronts:
-        pages.append(back_page)
+        pages.add_page(back_page)
+
+class SheetLayout(BaseModel):
+    registration_path: str
+    num_rows: int
+    num_cols: int
+    x_pos: List[int]
+    y_pos: List[int]
+    width: int
+    height: int
+    print_bleed: tuple[int, int]
+    crop: tuple[float, float]
+    ppi_ratio: float
+    extend_corners: int
+
+    # Moves the back pages to make up for the misalignment of the printer
+    offset: OffsetData | None = None
+
+    # How card images are scaled and pages are compressed
+    preset: RenderPreset = RenderPreset.PRINT
+
+class Sheet(BaseModel):
+    front_paths: List[str | None]
+
+    # Only double-sided sheets have their own backs, single-sided sheets share a back page
+    back_paths: List[str | None] | None = None
+
+    # Content hashes of the images on this sheet, keyed by path
+    image_hashes: Dict[str, str] = {}
+
+    # Hashes of the images that appear more than once in the render
+    shared_hashes: Set[str] = set()
+
+    # Keys of the pages of this sheet, see get_page_key
+    page_keys: List[str] = []
+
+    # Sheets that haven't changed since the previous render are copied from its output instead of being composed
+    reuse: bool = False
+
+def load_registration_image(registration_path: str, ppi_ratio: float, image_cache: ImageCache | None = None) -> Image.Image:
+    # The file is only read again when it has been modified, even by long-running workers
+    stat = os.stat(registration_path)
+    return load_registration_image_file(registration_path, stat.st_mtime_ns, stat.st_size, ppi_ratio, image_cache)
+
+# Only the last few are kept, batch and server workers render many decks and each may use another PPI
+@functools.lru_cache(maxsize=2)
+def load_registration_image_file(registration_path: str, mtime_ns: int, size: int, ppi_ratio: float, image_cache: ImageCache | None = None) -> Image.Image:
+    # The registration image only needs to be cached when it has to be scaled
+    key = None
+    if image_cache is not None and ppi_ratio != 1:
+        key = get_cache_key('registration', template_cache_version, hash_file(registration_path), ppi_ratio)
+        with profile_stage('cache read'):
+            reg_im = image_cache.get(key)
+
+        if reg_im is not None:
+            return reg_im
+
+    with Image.open(registration_path) as reg_im:
+        reg_im = reg_im.resize([math.floor(reg_im.width * ppi_ratio), math.floor(reg_im.height * ppi_ratio)])
+
+    if key is not None:
+        with profile_stage('cache write'):
+            image_cache.put(key, reg_im)
+
+    return reg_im
+
+def load_offset_registration_image(registration_path: str, ppi_ratio: float, offset: OffsetData, image_cache: ImageCache | None = None) -> Image.Image:
+    stat = os.stat(registration_path)
+    return load_offset_registration_image_file(registration_path, stat.st_mtime_ns, stat.st_size, ppi_ratio, offset, image_cache)
+
+@functools.lru_cache(maxsize=2)
+def load_offset_registration_image_file(registration_path: str, mtime_ns: int, size: int, ppi_ratio: float, offset: OffsetData, image_cache: ImageCache | None = None) -> Image.Image:
+    # Every back page starts from the same moved registration marks
+    registration_image = load_registration_image_file(registration_path, mtime_ns, size, ppi_ratio, image_cache)
+    return offset_image(registration_image, offset.x_offset, offset.y_offset, round(ppi_ratio * 300), offset.angle)
+
+def load_card_image(image_path: str, min_size: tuple[int, int] | None = None) -> Image.Image:
+    """
+    Opens a card image upright. When min_size is given, images much larger
+    than min_size are decoded at a reduced scale that is still at least
+    min_size, so pixels that would be thrown away by the resize are never
+    decoded.
+
+    The file is closed as soon as the image is decoded, even for formats
+    with several frames, so only one card file is open at a time.
+    """
+    with profile_stage('decode'), Image.open(image_path) as image:
+        if min_size is not None:
+            min_width, min_height = min_size
+
+            # The EXIF orientation may swap the width and height
+            orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+            if orientation in (5, 6, 7, 8):
+                min_width, min_height = min_height, min_width
+
+            if image.format == 'JPEG':
+                # JPEG can decode at 1/2, 1/4 or 1/8 scale directly
+                image.draft(image.mode, (min_width, min_height))
+            elif image.mode in ('L', 'LA', 'RGB', 'RGBA', 'CMYK'):
+                factor = min(image.width // max(min_width, 1), image.height // max(min_height, 1))
+                if factor > 1:
+                    image = image.reduce(factor)
+
+        # Decode now rather than in whichever stage touches the pixels first
+        image.load()
+
+    with profile_stage('exif_transpose'):
+        # In place, so that upright images aren't copied
+        ImageOps.exif_transpose(image, in_place=True)
+
+    return image
+
+def get_min_card_image_size(width: int, height: int, crop: tuple[float, float], ppi_ratio: float, preset: RenderPreset) -> tuple[int, int] | None:
+    # The print preset always decodes the full image, so it draws exactly what a full decode would
+    if not render_presets[preset].prescale:
+        return None
+
+    # The smallest image that still fills the slot after the crop is removed
+    crop_x_percent, crop_y_percent = crop
+    return (
+        math.ceil(math.floor(width * ppi_ratio) / (1 - crop_x_percent / 100)),
+        math.ceil(math.floor(height * ppi_ratio) / (1 - crop_y_percent / 100))
+    )
+
+@profiled('compose page')
+def compose_card_page(image_paths: List[str | None], sheet_layout: SheetLayout, flip: bool, card_tiles: CardTiles | None = None) -> Image.Image:
+    image_cache = card_tiles.image_cache if card_tiles is not None else None
+
+    # Only back pages are moved by the offset
+    offset = sheet_layout.offset if flip else None
+
+    with profile_stage('registration'):
+        if offset is None:
+            page = load_registration_image(sheet_layout.registration_path, sheet_layout.ppi_ratio, image_cache).copy()
+        else:
+            page = load_offset_registration_image(sheet_layout.registration_path, sheet_layout.ppi_ratio, offset, image_cache).copy()
+
+    draw_card_layout(
+        image_paths,
+        page,
+        sheet_layout.num_rows,
+        sheet_layout.num_cols,
+        sheet_layout.x_pos,
+        sheet_layout.y_pos,
+        sheet_layout.width,
+        sheet_layout.height,
+        sheet_layout.print_bleed,
+        sheet_layout.crop,
+        sheet_layout.ppi_ratio,
+        sheet_layout.extend_corners,
+        flip=flip,
+        card_tiles=card_tiles,
+        offset=offset,
+        preset=sheet_layout.preset
+    )
+
+    return page
+
+@profiled('back page')
+def load_back_page(back_image_paths: List[str | None], sheet_layout: SheetLayout, image_cache: ImageCache | None = None) -> Image.Image:
+    if image_cache is None:
+        return compose_card_page(back_image_paths, sheet_layout, flip=True)
+
+    back_image_hashes = {path: hash_file(path) for path in set(back_image_paths) if path is not None}
+    key = get_cache_key(
+        'back',
+        template_cache_version,
+        hash_file(sheet_layout.registration_path),
+        sheet_layout.model_dump(mode='json'),
+        [None if path is None else back_image_hashes[path] for path in back_image_paths]
+    )
+
+    with profile_stage('cache read'):
+        back_page = image_cache.get(key)
+
+    if back_page is None:
+        back_page = compose_card_page(back_image_paths, sheet_layout, flip=True, card_tiles=CardTiles(image_cache))
+
+        with profile_stage('cache write'):
+            image_cache.put(key, back_page)
+
+    return back_page
+
+@profiled('compose sheet')
+def compose_sheet(sheet: Sheet, sheet_layout: SheetLayout, image_cache: ImageCache | None = None) -> tuple[Image.Image, Image.Image | None]:
+    front_page = compose_card_page(sheet.front_paths, sheet_layout, flip=False, card_tiles=CardTiles(image_cache, sheet.image_hashes, sheet.shared_hashes))
+
+    back_page = None
+    if sheet.back_paths is not None:
+        back_page = compose_card_page(sheet.back_paths, sheet_layout, flip=True, card_tiles=CardTiles(image_cache, sheet.image_hashes, sheet.shared_hashes))
+
+    return front_page, back_page
+
+def compose_profiled_sheet(sheet: Sheet, sheet_layout: SheetLayout, image_cache: ImageCache | None = None) -> tuple[Image.Image, Image.Image | None, dict]:
+    # Runs in a worker process, which profiles the sheet on its own and hands back the records
+    global profiler
+    profiler = Profiler()
+    try:
+        return *compose_sheet(sheet, sheet_layout, image_cache), profiler.get_records()
+    finally:
+        profiler = None
+
+def compose_sheets(sheets: Iterable[Sheet], sheet_layout: SheetLayout, jobs: int, image_cache: ImageCache | None = None) -> Iterator[tuple[Sheet, Image.Image, Image.Image | None]]:
+    """
+    Composes sheets in order. With more than one job, sheets are composed in
+    a process pool but still yielded in their original order. Only a few
+    sheets are in flight at once so finished pages don't pile up in memory.
+
+    Sheets marked for reuse are yielded without pages.
+    """
+    if jobs <= 1:
+        for sheet in sheets:
+            if sheet.reuse:
+                yield sheet, None, None
+            else:
+                yield sheet, *compose_sheet(sheet, sheet_layout, image_cache)
+        return
+
+    # Workers only profile when this process does, since profiling is set per process
+    if profiler is None:
+        compose = compose_sheet
+    else:
+        compose = compose_profiled_sheet
+
+    def get_result(future) -> tuple[Image.Image | None, Image.Image | None]:
+        if future is None:
+            return None, None
+
+        with profile_stage('wait for workers'):
+            result = future.result()
+
+        if profiler is None:
+            return result
+
+        # Worker stages run in parallel, so their times add up to more than the wall time
+        *pages, records = result
+        profiler.merge(records)
+        return tuple(pages)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        in_flight = deque()
+
+        for sheet in sheets:
+            in_flight.append((sheet, None if sheet.reuse else executor.submit(compose, sheet, sheet_layout, image_cache)))
+
+            if len(in_flight) >= jobs * 2:
+                sheet, future = in_flight.popleft()
+                yield sheet, *get_result(future)
 
+        while in_flight:
+            sheet, future = in_flight.popleft()
+            yield sheet, *get_result(future)
+
+def plan_sheets(
+    front_dir_path: str,
+    double_sided_dir_path: str,
+    single_sided_files: List[str],
+    double_sided_files: List[str],
+    num_cards: int,
+    skip_indices: List[int],
+    image_hashes: Dict[str, str],
+    shared_hashes: Set[str]
+) -> Iterator[Sheet]:
+    def create_sheet(front_paths: List[str | None], back_paths: List[str | None] | None = None) -> Sheet:
+        sheet_paths = [path for path in front_paths + (back_paths or []) if path is not None]
+        sheet_hashes = {path: image_hashes[path] for path in sheet_paths}
+
+        return Sheet(
+            front_paths=front_paths,
+            back_paths=back_paths,
+            image_hashes=sheet_hashes,
+            shared_hashes=shared_hashes.intersection(sheet_hashes.values())
+        )
+
+    num_image = 1
+
+    # Create single-sided card layout
+    it = iter(single_sided_files)
+    while True:
+        file_group = list(itertools.islice(it, num_cards - len(skip_indices)))
+        if not file_group:
+            break
+
+        front_paths = []
+        file_group_iterator = iter(file_group)
+        for i in range(num_cards):
+            if i in skip_indices:
+                front_paths.append(None)
+                continue
+
+            try:
+                file = next(file_group_iterator)
+            except StopIteration:
+                break
+
+            print(f'Image {num_image}: {file}')
+            num_image = num_image + 1
+
+            front_paths.append(os.path.join(front_dir_path, file))
+
+        yield create_sheet(front_paths)
+
+    # Create double-sided card layout
+    it = iter(double_sided_files)
+    while True:
+        file_group = list(itertools.islice(it, num_cards - len(skip_indices)))
+        if not file_group:
+            break
+
+        front_paths = []
+        back_paths = []
+        file_group_iterator = iter(file_group)
+        for i in range(num_cards):
+            if i in skip_indices:
+                front_paths.append(None)
+                back_paths.append(None)
+                continue
+
+            try:
+                file = next(file_group_iterator)
+            except StopIteration:
+                break
+
+            print(f'Image {num_image} (double-sided): {file}')
+            num_image = num_image + 1
+
+            front_paths.append(os.path.join(front_dir_path, file))
+            back_paths.append(os.path.join(double_sided_dir_path, file))
+
+        yield create_sheet(front_paths, back_paths)
+
+class PageManifest(BaseModel):
+    version: int = page_manifest_version
+
+    # Key of the render parameters shared by every page
+    render_key: str
+
+    # Key of every page of the output, in order
+    pages: List[str]
+
+    # Size and modification time of the output files, to tell whether they changed after the render
+    files: Dict[str, tuple[int, int]]
+
+def get_manifest_path(output_path: str, output_images: bool) -> str:
+    if output_images:
+        return os.path.join(output_path, 'manifest.json')
+
+    return f'{os.path.splitext(output_path)[0]}.manifest.json'
+
+def get_page_file_paths(output_path: str, output_images: bool, page_index: int, image_format: ImageFormat = ImageFormat.PNG) -> List[str]:
+    # The output files that a page is written to
+    if output_images:
+        return [os.path.join(output_path, get_page_image_filename(page_index, image_format))]
+
+    return [output_path]
+
+def load_page_manifest(manifest_path: str, render_key: str) -> PageManifest | None:
+    """
+    Loads the manifest of the previous render. Returns None when there is no
+    manifest, or when it was rendered with different parameters and none of
+    its pages can be reused.
+    """
+    try:
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = PageManifest(**json.load(manifest_file))
+    except (OSError, json.JSONDecodeError, ValidationError):
+        return None
+
+    if manifest.version != page_manifest_version or manifest.render_key != render_key:
+        return None
+
+    return manifest
+
+def save_page_manifest(manifest_path: str, render_key: str, page_keys: List[str], output_path: str, output_images: bool, image_format: ImageFormat = ImageFormat.PNG):
+    files = {}
+    for page_index in range(len(page_keys)):
+        for path in get_page_file_paths(output_path, output_images, page_index, image_format):
+            files[os.path.basename(path)] = get_file_stat(path)
+
+    with open(manifest_path, 'w') as manifest_file:
+        manifest_file.write(PageManifest(render_key=render_key, pages=page_keys, files=files).model_dump_json(indent=4))
+
+def get_page_key(render_key: str, page_index: int, image_hashes: List[str | None] | None, label: str | None = None) -> str:
+    # image_hashes is None for the shared back page of single-sided sheets
+    return get_cache_key('page', render_key, page_index, image_hashes, label)
+
+def plan_pages(
+    sheets: Iterable[Sheet],
+    render_key: str,
+    template: str,
+    only_fronts: bool,
+    name: str,
+    previous_manifest: PageManifest | None,
+    output_path: str,
+    output_images: bool,
+    image_format: ImageFormat = ImageFormat.PNG
+) -> Iterator[Sheet]:
+    """
+    Sets the keys of the pages of each sheet. A sheet is reused when all of
+    its pages have the same keys as the pages at the same position in the
+    previous render and their output files haven't changed since.
+    """
+    page_index = 0
+    for sheet in sheets:
+        double_sided = sheet.back_paths is not None
+
+        # The label has the sheet number, so a page is only reused at the same position
+        label = get_sheet_label(page_index, template, only_fronts and not double_sided, name)
+        page_keys = [get_page_key(render_key, page_index, [sheet.image_hashes.get(path) for path in sheet.front_paths], label)]
+
+        if double_sided:
+            page_keys.append(get_page_key(render_key, page_index + 1, [sheet.image_hashes.get(path) for path in sheet.back_paths]))
+        elif not only_fronts:
+            page_keys.append(get_page_key(render_key, page_index + 1, None))
+
+        reuse = previous_manifest is not None
+        for index, page_key in enumerate(page_keys, start=page_index):
+            if not reuse:
+                break
+
+            reuse = (
+                index < len(previous_manifest.pages)
+                and previous_manifest.pages[index] == page_key
+                and all(
+                    previous_manifest.files.get(os.path.basename(path)) == get_file_stat(path)
+                    for path in get_page_file_paths(output_path, output_images, index, image_format)
+                )
+            )
+
+        sheet.page_keys = page_keys
+        sheet.reuse = reuse
+        page_index += len(page_keys)
+
+        yield sheet
+
+@profiled('generate_pdf')
 def generate_pdf(
     front_dir_path: str,
     back_dir_path: str,
@@ -303,7 +1434,16 @@ def generate_pdf(
     quality: int,
     skip_indices: List[int],
     load_offset: bool,
-    name: str
+    name: str,
+    jobs: int = 1,
+    cache_size: int = 0,
+    engine: PdfEngine = PdfEngine.RASTER,
+    image_format: ImageFormat = ImageFormat.PNG,
+    compress_level: int = 6,
+    preset: RenderPreset = RenderPreset.PRINT,
+    check_only: bool = False,
+    output_cache_size: int = 0,
+    verify_images: bool = False
 ):
     # Sanity checks for the different directories
     f_path = Path(front_dir_path)
@@ -325,11 +1465,64 @@ def generate_pdf(
 
     # Sanity check for output images
     if output_images:
+        if engine == PdfEngine.DIRECT:
+            raise Exception(f'Cannot use "--output_images" with the "{PdfEngine.DIRECT.value}" engine, which only creates PDFs.')
+
         output_path = get_directory(output_path)
     else:
         if not output_path.lower().endswith(".pdf"):
             raise Exception(f'Cannot save PDF to output path "{output_path}" because it is not a valid PDF file path.')
 
+    layouts = load_layouts()
+
+    # paper_layout represents the size of a paper and all possible card layouts
+    if paper_size not in layouts.paper_layouts:
+        raise Exception(f'Unsupported paper size "{paper_size}".')
+    paper_layout = layouts.paper_layouts[paper_size]
+
+    # card_layout_size represents the size of a card
+    if card_size not in layouts.card_sizes:
+        raise Exception(f'Unsupported card size "{card_size}". Try card sizes: {paper_layout.card_layouts.keys()}.')
+    card_layout_size = layouts.card_sizes[card_size]
+
+    # card_layout represents the position of cards
+    if card_size not in paper_layout.card_layouts:
+        raise Exception(f'Unsupported card size "{card_size}" with paper size "{paper_size}". Try card sizes: {paper_layout.card_layouts.keys()}.')
+    card_layout = paper_layout.card_layouts[card_size]
+
+    # Fail before any sheet is composed rather than once the first page is encoded
+    if output_images and ImageFormat(image_format) == ImageFormat.WEBP:
+        page_size = max(math.floor(paper_layout.width * ppi / 300), math.floor(paper_layout.height * ppi / 300))
+        if page_size > max_webp_size:
+            max_ppi = max_webp_size * 300 // max(paper_layout.width, paper_layout.height)
+            raise click.BadParameter(f'{paper_size} pages are {page_size} pixels long at {ppi} PPI, but WebP images can be at most {max_webp_size} pixels long. Use a PPI of at most {max_ppi} or another "--image_format".', param_hint="'--ppi'")
+
+    # Determine the amount of x and y crop
+    crop = parse_crop_string(crop_string, card_layout_size.width, card_layout_size.height)
+
+    # Check every image before any work is done, the direct engine draws images at their own resolution.
+    # Images are only decoded to check them with check_only here, or with verify_images once the output cache misses
+    with profile_stage('preflight'):
+        preflight = check_card_images(
+            front_dir_path,
+            back_dir_path,
+            double_sided_dir_path,
+            only_fronts,
+            card_size,
+            card_layout_size.width,
+            card_layout_size.height,
+            crop,
+            None if engine == PdfEngine.DIRECT else ppi,
+            jobs,
+            verify=check_only
+        )
+
+    print_preflight_report(preflight)
+
+    if check_only:
+        print(f'Checked {preflight.num_images} image{"s" if preflight.num_images != 1 else ""}, {len(preflight.warnings)} warning{"s" if len(preflight.warnings) != 1 else ""}')
+        return
+
     # Get the back image, if it exists
     back_card_image_path = None
     use_default_back_page = True
@@ -339,285 +1532,323 @@ def generate_pdf(
         if use_default_back_page:
             print(f'No back image provided in back image directory \"{back_dir_path}\". Using default instead.')
 
-    front_image_filenames = get_image_file_paths(front_dir_path)
-    ds_image_filenames = get_image_file_paths(double_sided_dir_path)
-
-    # Check if double-sided back images has matching front images
-    front_set = set(front_image_filenames)
+    with profile_stage('discover'):
+        front_image_filenames = get_image_file_paths(front_dir_path)
+        ds_image_filenames = get_image_file_paths(double_sided_dir_path)
     ds_set = set(ds_image_filenames)
-    if not ds_set.issubset(front_set):
-        raise Exception(f'Double-sided backs "{ds_set - front_set}" do not have matching fronts. Add the missing fronts to front image directory "{front_dir_path}".')
 
-    if only_fronts:
-        if len(ds_set) > 0:
-            raise Exception(f'Cannot use "--only_fronts" with double-sided cards. Remove cards from double-side image directory "{double_sided_dir_path}".')
+    num_rows = len(card_layout.y_pos)
+    num_cols = len(card_layout.x_pos)
+    num_cards = num_rows * num_cols
 
-    with open(layouts_path, 'r') as layouts_file:
-        try:
-            layouts_data = json.load(layouts_file)
-            layouts = Layouts(**layouts_data)
+    # Check skip indices
+    # You can only skip valid indices (within the max card count per page)
+    clean_skip_indices = [n for n in skip_indices if n < num_cards]
+    ignore_skip_indices = [n for n in skip_indices if n >= num_cards]
 
-        except ValidationErr as e:
-            raise Exception(f'Cannot parse layouts.json: {e}.')
+    if len(ignore_skip_indices) > 0:
+        print(f'Ignoring skip indices that are outside range 0-{num_cards - 1}: {ignore_skip_indices}')
 
-        # paper_layout represents the size of a paper and all possible card layouts
-        if paper_size not in layouts.paper_layouts:
-            raise Exception(f'Unsupported paper size "{paper_size}".')
-        paper_layout = layouts.paper_layouts[paper_size]
-
-        # card_layout_size represents the size of a card
-        if card_size not in layouts.card_sizes:
-            raise Exception(f'Unsupported card size "{card_size}". Try card sizes: {paper_layout.card_layouts.keys()}.')
-        card_layout_size = layouts.card_sizes[card_size]
-
-        # card_layout represents the position of cards
-        if card_size not in paper_layout.card_layouts:
-            raise Exception(f'Unsupported card size "{card_size}" with paper size "{paper_size}". Try card sizes: {paper_layout.card_layouts.keys()}.')
-        card_layout = paper_layout.card_layouts[card_size]
-
-        # Determine the amount of x and y crop
-        crop = parse_crop_string(crop_string, card_layout_size.width, card_layout_size.height)
-
-        num_rows = len(card_layout.y_pos)
-        num_cols = len(card_layout.x_pos)
-        num_cards = num_rows * num_cols
-
-        # Check skip indices
-        # You can only skip valid indices (within the max card count per page)
-        clean_skip_indices = [n for n in skip_indices if n < num_cards]
-        ignore_skip_indices = [n for n in skip_indices if n >= num_cards]
-
-        if len(ignore_skip_indices) > 0:
-            print(f'Ignoring skip indices that are outside range 0-{num_cards - 1}: {ignore_skip_indices}')
-
-        # If all possible cards are skipped, this may result in an infinite loop
-        if len(clean_skip_indices) == num_cards:
-            raise Exception(f'You cannot skip all cards per page')
-
-        registration_filename =  f'{paper_size}_registration.jpg'
-        registration_path = os.path.join(asset_directory, registration_filename)
-
-        # The baseline PPI is 300
-        ppi_ratio = ppi / 300
-
-        # Load an image with the registration marks
-        with Image.open(registration_path) as reg_im:
-            reg_im = reg_im.resize([math.floor(reg_im.width * ppi_ratio), math.floor(reg_im.height * ppi_ratio)])
-
-            # Create the array that will store the filled templates
-            pages: List[Image.Image] = []
-
-            max_print_bleed = calculate_max_print_bleed(card_layout.x_pos, card_layout.y_pos, card_layout_size.width, card_layout_size.height)
-
-            # Create reusable back page for single-sided cards
-            single_sided_back_page = reg_im.copy()
-            if not use_default_back_page:
-
-                # Load the card back image
-                with Image.open(back_card_image_path) as back_im:
-                    back_im = ImageOps.exif_transpose(back_im)
-
-                    back_images = [back_im] * num_cards
-                    for s in clean_skip_indices:
-                        back_images[s] = None
-
-                    draw_card_layout(
-                        back_images,
-                        single_sided_back_page,
-                        num_rows,
-                        num_cols,
-                        card_layout.x_pos,
-                        card_layout.y_pos,
-                        card_layout_size.width,
-                        card_layout_size.height,
-                        max_print_bleed,
-                        (0, 0),
-                        ppi_ratio,
-                        extend_corners,
-                        flip=True
-                    )
-
-            # Create single-sided card layout
-            num_image = 1
-            it = iter(natsorted(list(front_set - ds_set)))
-            while True:
-                file_group = list(itertools.islice(it, num_cards - len(clean_skip_indices)))
-                if not file_group:
-                    break
-
-                # Fetch card art
-                front_card_images = []
-                file_group_iterator = iter(file_group)
-                for i in range(num_cards):
-                    if i in clean_skip_indices:
-                        front_card_images.append(None)
-                        continue
-
-                    try:
-                        file = next(file_group_iterator)
-                    except StopIteration:
-                        break
-
-                    print(f'Image {num_image}: {file}')
-                    num_image = num_image + 1
-
-                    front_image_path = os.path.join(front_dir_path, file)
-                    front_image = Image.open(front_image_path)
-                    front_image = ImageOps.exif_transpose(front_image)
-                    front_card_images.append(front_image)
-
-                single_sided_front_page = reg_im.copy()
-
-                # Create front layout for single-sided cards
-                draw_card_layout(
-                    front_card_images,
-                    single_sided_front_page,
-                    num_rows,
-                    num_cols,
-                    card_layout.x_pos,
-                    card_layout.y_pos,
-                    card_layout_size.width,
-                    card_layout_size.height,
-                    max_print_bleed,
-                    crop,
-                    ppi_ratio,
-                    extend_corners,
-                    flip=False
-                )
+    # If all possible cards are skipped, this may result in an infinite loop
+    if len(clean_skip_indices) == num_cards:
+        raise Exception(f'You cannot skip all cards per page')
 
-                add_front_back_pages(
-                    single_sided_front_page,
-                    single_sided_back_page,
-                    pages,
-                    paper_layout.width,
-                    paper_layout.height,
-                    ppi_ratio,
-                    card_layout.template,
-                    only_fronts,
-                    name
-                )
+    registration_filename =  f'{paper_size}_registration.jpg'
+    registration_path = os.path.join(asset_directory, registration_filename)
 
-            # Create double-sided card layout
-            it = iter(natsorted(list(ds_set)))
-            while True:
-                file_group = list(itertools.islice(it, num_cards - len(clean_skip_indices)))
-                if not file_group:
-                    break
-
-                # Fetch card art
-                front_card_images = []
-                back_card_images = []
-                file_group_iterator = iter(file_group)
-                for i in range(num_cards):
-                    if i in clean_skip_indices:
-                        front_card_images.append(None)
-                        back_card_images.append(None)
-                        continue
-
-                    try:
-                        file = next(file_group_iterator)
-                    except StopIteration:
-                        break
-
-                    print(f'Image {num_image} (double-sided): {file}')
-                    num_image = num_image + 1
-
-                    front_image_path = os.path.join(front_dir_path, file)
-                    front_image = Image.open(front_image_path)
-                    front_image = ImageOps.exif_transpose(front_image)
-                    front_card_images.append(front_image)
-
-                    ds_image_path = os.path.join(double_sided_dir_path, file)
-                    ds_image = Image.open(ds_image_path)
-                    ds_image = ImageOps.exif_transpose(ds_image)
-                    back_card_images.append(ds_image)
-
-                double_sided_front_page = reg_im.copy()
-                double_sided_back_page = reg_im.copy()
-
-                # Create front layout for double-sided cards
-                draw_card_layout(
-                    front_card_images,
-                    double_sided_front_page,
-                    num_rows,
-                    num_cols,
-                    card_layout.x_pos,
-                    card_layout.y_pos,
-                    card_layout_size.width,
-                    card_layout_size.height,
-                    max_print_bleed,
-                    crop,
-                    ppi_ratio,
-                    extend_corners,
-                    flip=False
-                )
+    # The baseline PPI is 300
+    ppi_ratio = ppi / 300
 
-                # Create back layout for double-sided cards
-                draw_card_layout(
-                    back_card_images,
-                    double_sided_back_page,
-                    num_rows,
-                    num_cols,
-                    card_layout.x_pos,
-                    card_layout.y_pos,
-                    card_layout_size.width,
-                    card_layout_size.height,
-                    max_print_bleed,
-                    crop,
-                    ppi_ratio,
-                    extend_corners,
-                    flip=True
-                )
+    # Load saved offset if available
+    saved_offset = None
+    if load_offset:
+        saved_offset = load_saved_offset()
+
+        if saved_offset is None:
+            print('Offset cannot be applied')
+        else:
+            print(f'Loaded x offset: {saved_offset.x_offset}, y offset: {saved_offset.y_offset}, angle: {saved_offset.angle}')
+
+    max_print_bleed = calculate_max_print_bleed(card_layout.x_pos, card_layout.y_pos, card_layout_size.width, card_layout_size.height)
+
+    sheet_layout = SheetLayout(
+        registration_path=registration_path,
+        num_rows=num_rows,
+        num_cols=num_cols,
+        x_pos=card_layout.x_pos,
+        y_pos=card_layout.y_pos,
+        width=card_layout_size.width,
+        height=card_layout_size.height,
+        print_bleed=max_print_bleed,
+        crop=crop,
+        ppi_ratio=ppi_ratio,
+        extend_corners=extend_corners,
+        offset=saved_offset,
+        preset=preset
+    )
+
+    # Create reusable back page for single-sided cards
+    back_image_paths = [None] * num_cards
+    if not use_default_back_page:
+        back_image_paths = [None if i in clean_skip_indices else back_card_image_path for i in range(num_cards)]
+
+    # Hash every image up front so identical images are only processed once
+    image_paths = [os.path.join(front_dir_path, file) for file in front_image_filenames] + [os.path.join(double_sided_dir_path, file) for file in ds_image_filenames]
+    with profile_stage('hash'):
+        image_hashes = {path: hash_file(path) for path in image_paths}
+
+    hash_counts = Counter(image_hashes.values())
+    shared_hashes = {image_hash for image_hash, count in hash_counts.items() if count > 1}
+
+    num_duplicates = len(image_hashes) - len(hash_counts)
+    if num_duplicates > 0:
+        print(f'Found {num_duplicates} duplicate image{"s" if num_duplicates != 1 else ""}, each unique image is processed once')
+
+    sheets = plan_sheets(
+        front_dir_path,
+        double_sided_dir_path,
+        [file for file in front_image_filenames if file not in ds_set],
+        ds_image_filenames,
+        num_cards,
+        clean_skip_indices,
+        image_hashes,
+        shared_hashes
+    )
+
+    # Everything that affects every page, the keys of the pages themselves add their images and labels
+    render_key = get_cache_key(
+        page_manifest_version,
+        tile_cache_version,
+        template_cache_version,
+        engine,
+        output_images,
+        (image_format, compress_level) if output_images else None,
+        ppi,
+        quality,
+        only_fronts,
+        None if saved_offset is None else saved_offset.model_dump(),
+        sheet_layout.model_dump(mode='json'),
+        hash_file(registration_path),
+        [None if path is None else hash_file(path) for path in back_image_paths],
+        card_layout.template
+    )
+
+    # Sheets that haven't changed since the previous render are copied from its output
+    manifest_path = get_manifest_path(output_path, output_images)
+    previous_manifest = load_page_manifest(manifest_path, render_key)
+    sheets = plan_pages(sheets, render_key, card_layout.template, only_fronts, name, previous_manifest, output_path, output_images, image_format)
+
+    page_keys = []
+    num_reused_sheets = 0
+
+    # An identical render, of the same images in the same order with the same options, is copied from the output cache
+    output_cache = None
+    restored_page_keys = None
+    if output_cache_size > 0:
+        output_cache = OutputCache(max_size=output_cache_size * 1024 * 1024)
+        output_key = get_cache_key(
+            'output',
+            render_key,
+            hash_file(layouts_path),
+            name,
+            clean_skip_indices,
+            [(file, image_hashes[os.path.join(front_dir_path, file)]) for file in front_image_filenames],
+            [(file, image_hashes[os.path.join(double_sided_dir_path, file)]) for file in ds_image_filenames]
+        )
+
+        with profile_stage('output cache'):
+            restored_page_keys = output_cache.restore(output_key, output_path, output_images)
+
+    if restored_page_keys is None and verify_images:
+        # A restored output was made from the same images, so they're only decoded for a new render
+        verify_paths = set(image_paths) | {path for path in back_image_paths if path is not None}
+        with profile_stage('verify'):
+            decode_errors = verify_card_images((front_dir_path, double_sided_dir_path, back_dir_path), verify_paths, jobs)
+
+        print_preflight_report(PreflightReport(num_images=len(verify_paths), errors=[f'Cannot decode "{path}": {error}' for path, error in decode_errors.items()]))
+
+    if restored_page_keys is not None:
+        page_keys = restored_page_keys
+
+    elif engine == PdfEngine.DIRECT:
+        with DirectPdfWriter(output_path, sheet_layout, quality) as pages:
+            # The card back is never cropped
+            single_sided_back_template = pages.create_template(back_image_paths, (0, 0), flip=True)
+
+            for sheet in sheets:
+                page_keys.extend(sheet.page_keys)
+
+                if sheet.reuse:
+                    for _ in sheet.page_keys:
+                        pages.reuse_page()
+
+                    num_reused_sheets += 1
+                    continue
+
+                double_sided = sheet.back_paths is not None
+                sheet_only_fronts = only_fronts and not double_sided
+
+                label = get_sheet_label(pages.page_count, card_layout.template, sheet_only_fronts, name)
+                pages.add_page(sheet.front_paths, crop, label=label, label_position=(paper_layout.width - 180, paper_layout.height - 140))
+
+                if double_sided:
+                    pages.add_page(sheet.back_paths, crop, flip=True, back=True)
+                elif not sheet_only_fronts:
+                    pages.add_page(template=single_sided_back_template, back=True)
+
+    else:
+        # Processed card tiles and sheet templates are reused across runs when the cache is enabled
+        image_cache = None
+        if cache_size > 0:
+            image_cache = ImageCache(max_size=cache_size * 1024 * 1024)
+
+        # The card back is never cropped, and isn't needed when every sheet is reused
+        @functools.cache
+        def get_single_sided_back_page() -> Image.Image:
+            return load_back_page(back_image_paths, sheet_layout.model_copy(update={'crop': (0, 0)}), image_cache)
+
+        with PageWriter(output_path, output_images, ppi, quality, image_format=image_format, compress_level=compress_level, jobs=jobs, subsampling=render_presets[sheet_layout.preset].subsampling) as pages:
+            for sheet, front_page, back_page in compose_sheets(sheets, sheet_layout, jobs, image_cache):
+                page_keys.extend(sheet.page_keys)
+
+                if sheet.reuse:
+                    for _ in sheet.page_keys:
+                        pages.reuse_page()
+
+                    num_reused_sheets += 1
+                    continue
+
+                double_sided = sheet.back_paths is not None
 
-                # Add the front and back layouts
                 add_front_back_pages(
-                    double_sided_front_page,
-                    double_sided_back_page,
+                    front_page,
+                    back_page if double_sided else get_single_sided_back_page(),
                     pages,
                     paper_layout.width,
                     paper_layout.height,
                     ppi_ratio,
                     card_layout.template,
-                    False,
+                    only_fronts and not double_sided,
                     name
                 )
 
-            if len(pages) == 0:
-                print('No pages were generated')
-                return
+        if image_cache is not None:
+            with profile_stage('cache prune'):
+                image_cache.prune()
 
-            # Load saved offset if available
-            if load_offset:
-                saved_offset = load_saved_offset()
+    if len(page_keys) == 0:
+        print('No pages were generated')
+        return
 
-                if saved_offset is None:
-                    print('Offset cannot be applied')
-                else:
-                    print(f'Loaded x offset: {saved_offset.x_offset}, y offset: {saved_offset.y_offset}')
-                    pages = offset_images(pages, saved_offset.x_offset, saved_offset.y_offset, ppi)
+    if previous_manifest is not None and output_images:
+        # Remove the pages of the previous render that are past the end of this one
+        for page_index in range(len(page_keys), len(previous_manifest.pages)):
+            for path in get_page_file_paths(output_path, output_images, page_index, image_format):
+                if os.path.exists(path):
+                    os.remove(path)
 
-            # Save the pages array as a PDF
-            if output_images:
-                for index, page in enumerate(pages):
-                    page.save(os.path.join(output_path, f'page{index + 1}.png'), resolution=math.floor(300 * ppi_ratio), speed=0, subsampling=0, quality=quality)
+    save_page_manifest(manifest_path, render_key, page_keys, output_path, output_images, image_format)
 
-                print(f'Generated images: {output_path}')
+    if restored_page_keys is not None:
+        print('Copied an identical render from the output cache')
+    elif output_cache is not None:
+        file_paths = [path for page_index in range(len(page_keys)) for path in get_page_file_paths(output_path, output_images, page_index, image_format)]
 
-            else:
-                pages[0].save(output_path, format='PDF', save_all=True, append_images=pages[1:], resolution=math.floor(300 * ppi_ratio), speed=0, subsampling=0, quality=quality)
-                print(f'Generated PDF: {output_path}')
+        with profile_stage('output cache'):
+            output_cache.store(output_key, page_keys, list(dict.fromkeys(file_paths)))
+            output_cache.prune()
 
-class OffsetData(BaseModel):
-    x_offset: int
-    y_offset: int
+    if num_reused_sheets > 0:
+        print(f'Reused {num_reused_sheets} unchanged sheet{"s" if num_reused_sheets != 1 else ""} from the previous render')
+
+    if output_images:
+        print(f'Generated images: {output_path}')
+    else:
+        print(f'Generated PDF: {output_path}')
 
-def save_offset(x_offset, y_offset) -> None:
+class IngestImage(BaseModel):
+    path: str
+
+    # How the image is drawn, a tile is made for each way
+    crop: tuple[float, float]
+    flip: bool
+
+def ingest_card_image(image: IngestImage, width: int, height: int, ppi_ratio: float, extend_corners: int, preset: RenderPreset, ingest_store: IngestStore):
+    # Makes the tile exactly like CardTiles does, for the version of the image read before decoding it
+    source = IngestStore.get_source(image.path)
+    card_image = load_card_image(image.path, get_min_card_image_size(width, height, image.crop, ppi_ratio, preset))
+    card_tile = create_card_tile(card_image, width, height, image.crop, ppi_ratio, extend_corners, image.flip, preset).convert('RGB')
+    ingest_store.put(image.path, source, width, height, image.crop, ppi_ratio, extend_corners, image.flip, preset, card_tile)
+
+def ingest_card_images(
+    front_dir_path: str,
+    back_dir_path: str,
+    double_sided_dir_path: str,
+    card_size: CardSize,
+    crop_string: str | None,
+    extend_corners: int,
+    ppi: int,
+    jobs: int = 1,
+    preset: RenderPreset = RenderPreset.PRINT
+):
+    """
+    Converts every card image into the tile that a render draws, upright,
+    in RGB and scaled, cropped and trimmed for the card size and PPI, and
+    saves the tiles in the ingest store. Only new and changed images are
+    converted again, and renders with the same options read the tiles
+    without decoding or converting the images.
+    """
+    for dir_path, description in ((front_dir_path, 'Front'), (back_dir_path, 'Back'), (double_sided_dir_path, 'Double-sided')):
+        if not os.path.isdir(dir_path):
+            raise Exception(f'{description} image directory path "{dir_path}" is invalid.')
+
+        delete_hidden_files_in_directory(dir_path)
+
+    layouts = load_layouts()
+    if card_size not in layouts.card_sizes:
+        raise Exception(f'Unsupported card size "{card_size}".')
+    card_layout_size = layouts.card_sizes[card_size]
+
+    width = card_layout_size.width
+    height = card_layout_size.height
+    crop = parse_crop_string(crop_string, width, height)
+    ppi_ratio = ppi / 300
+    preset = RenderPreset(preset)
+
+    # Fronts and double-sided backs are cropped, backs are flipped, and the back of single-sided cards is never cropped
+    images = [IngestImage(path=os.path.join(front_dir_path, file), crop=crop, flip=False) for file in get_image_file_paths(front_dir_path)]
+    images += [IngestImage(path=os.path.join(double_sided_dir_path, file), crop=crop, flip=True) for file in get_image_file_paths(double_sided_dir_path)]
+    images += [IngestImage(path=os.path.join(back_dir_path, file), crop=(0, 0), flip=True) for file in get_back_card_image_files(back_dir_path)]
+
+    ingest_store = IngestStore()
+
+    # Images with an up to date tile are skipped
+    new_images = [image for image in images if not ingest_store.has(image.path, width, height, image.crop, ppi_ratio, extend_corners, image.flip, preset)]
+    print(f'Found {len(images)} image{"s" if len(images) != 1 else ""}, {len(new_images)} to ingest')
+
+    def report(num_done: int, image: IngestImage):
+        print(f'[{num_done}/{len(new_images)}] Ingested {image.path}')
+
+    if jobs <= 1:
+        for num_done, image in enumerate(new_images, start=1):
+            ingest_card_image(image, width, height, ppi_ratio, extend_corners, preset, ingest_store)
+            report(num_done, image)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(ingest_card_image, image, width, height, ppi_ratio, extend_corners, preset, ingest_store): image for image in new_images}
+            for num_done, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                report(num_done, futures[future])
+
+    print(f'Ingested {len(new_images)} new or changed image{"s" if len(new_images) != 1 else ""}')
+
+def save_offset(x_offset, y_offset, angle=0) -> None:
     # Create the directory if it doesn't exist
     os.makedirs('data', exist_ok=True)
 
     # Save the offset data to a JSON file
     with open('data/offset_data.json', 'w') as offset_file:
-        offset_file.write(OffsetData(x_offset=x_offset, y_offset=y_offset).model_dump_json(indent=4))
+        offset_file.write(OffsetData(x_offset=x_offset, y_offset=y_offset, angle=angle).model_dump_json(indent=4))
 
     print('Offset data saved!')
 
@@ -636,19 +1867,697 @@ def load_saved_offset() -> OffsetData:
 
     return None
 
-def offset_images(images: List[Image.Image], x_offset: int, y_offset: int, ppi: int) -> List[Image.Image]:
-    offset_images = []
+def move_image(image: Image.Image, position: tuple[float, float], page_size: tuple[int, int], x_offset: float, y_offset: float, angle: float) -> tuple[Image.Image, tuple[int, int]]:
+    """
+    Moves an image at position on a page along with the page, which is
+    rotated by angle degrees counterclockwise around its center and then
+    shifted by the offset in pixels. Returns the moved image, with a
+    transparent background, and the position to paste it at.
+    """
+    width, height = image.size
+    cos = math.cos(math.radians(angle))
+    sin = math.sin(math.radians(angle))
+
+    # Where the center of the image ends up
+    page_center_x, page_center_y = page_size[0] / 2, page_size[1] / 2
+    relative_x = position[0] + width / 2 - page_center_x
+    relative_y = position[1] + height / 2 - page_center_y
+    center_x = page_center_x + relative_x * cos + relative_y * sin + x_offset
+    center_y = page_center_y - relative_x * sin + relative_y * cos + y_offset
+
+    # Leave room for the rotated corners and the fractional part of the position
+    moved_width = math.ceil(abs(width * cos) + abs(height * sin)) + 2
+    moved_height = math.ceil(abs(width * sin) + abs(height * cos)) + 2
+    left = math.floor(center_x - moved_width / 2)
+    top = math.floor(center_y - moved_height / 2)
+
+    # Maps every pixel of the moved image back to the original image
+    dx, dy = left - center_x, top - center_y
+    data = (
+        cos, -sin, width / 2 + dx * cos - dy * sin,
+        sin, cos, height / 2 + dx * sin + dy * cos
+    )
+
+    # Premultiplied alpha keeps the transparent background from darkening the edges
+    moved = image.convert('RGBa').transform((moved_width, moved_height), Image.Transform.AFFINE, data, resample=Image.Resampling.BICUBIC)
+    return moved.convert('RGBA'), (left, top)
+
+def offset_image(image: Image.Image, x_offset: float, y_offset: float, ppi: int, angle: float = 0) -> Image.Image:
+    """
+    Moves a whole page. Uncovered areas are left white rather than
+    wrapping around, and only fractional or rotated moves are resampled.
+    """
+    x_offset = x_offset * ppi / 300
+    y_offset = y_offset * ppi / 300
+
+    offset_page = Image.new(image.mode, image.size, 'white')
+    if angle == 0 and x_offset.is_integer() and y_offset.is_integer():
+        offset_page.paste(image, (int(x_offset), int(y_offset)))
+    else:
+        moved, position = move_image(image, (0, 0), image.size, x_offset, y_offset, angle)
+        offset_page.paste(moved, position, moved)
+
+    return offset_page
+
+def get_offset_matrix(x_offset: float, y_offset: float, angle: float, box: tuple[float, float, float, float], rotation: int = 0) -> pdfium.PdfMatrix:
+    """
+    Returns the PDF transform that moves a page like offset_image does.
+    Offsets are in pixels at 300 PPI, and box is the left, bottom, right
+    and top of the page in points. Pages displayed with a rotation of
+    their own are moved as they are displayed.
+    """
+    points_per_pixel = 72 / 300
+
+    # PDF coordinates point up, and are turned clockwise by the page rotation when displayed
+    radians = math.radians(rotation)
+    shift_x = x_offset * points_per_pixel
+    shift_y = -y_offset * points_per_pixel
+    shift_x, shift_y = (
+        shift_x * math.cos(radians) - shift_y * math.sin(radians),
+        shift_x * math.sin(radians) + shift_y * math.cos(radians)
+    )
+
+    left, bottom, right, top = box
+    center_x = (left + right) / 2
+    center_y = (bottom + top) / 2
+    return pdfium.PdfMatrix().translate(-center_x, -center_y).rotate(angle, ccw=True).translate(center_x + shift_x, center_y + shift_y)
+
+def offset_pdf_pages(pdf_path: str, output_pdf_path: str, x_offset: float, y_offset: float, angle: float = 0) -> int:
+    """
+    Moves every other page of a PDF without rendering it. The transform
+    is wrapped around the existing content of each back page, so images
+    and text are kept exactly as they are. Returns the number of pages.
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+
+    try:
+        for page_index in range(1, len(pdf), 2):
+            page = pdf[page_index]
+            matrix = get_offset_matrix(x_offset, y_offset, angle, page.get_mediabox(), page.get_rotation())
+            pdfium_c.FPDFPage_TransFormWithClip(page, ctypes.byref(matrix.to_raw()), None)
+            page.close()
+
+        # The input is read lazily, so it may only be replaced once it is closed
+        page_count = len(pdf)
+        pdf.save(f'{output_pdf_path}.tmp')
+    finally:
+        pdf.close()
+
+    os.replace(f'{output_pdf_path}.tmp', output_pdf_path)
+
+    return page_count
 
-    add_offset = False
-    for image in images:
-        if add_offset:
-            offset_images.append(ImageChops.offset(image, math.floor(x_offset * ppi / 300), math.floor(y_offset * ppi / 300)))
+def render_offset_page(pdf_path: str, page_index: int, ppi: int, quality: int, offset: OffsetData | None = None) -> tuple[bytes, int, int]:
+    # Renders a page, moves it if given an offset, and returns its JPEG data along with its size
+    pdf = pdfium.PdfDocument(pdf_path)
+
+    try:
+        page = pdf[page_index]
+        image = page.render(scale=ppi / 72).to_pil()
+        page.close()
+    finally:
+        pdf.close()
+
+    if offset is not None:
+        image = offset_image(image, offset.x_offset, offset.y_offset, ppi, offset.angle)
+
+    jpeg = io.BytesIO()
+    image.convert('RGB').save(jpeg, format='JPEG', quality=quality, subsampling=0)
+    return jpeg.getvalue(), image.width, image.height
+
+def render_offset_pdf_pages(pdf_path: str, output_pdf_path: str, x_offset: float, y_offset: float, angle: float = 0, ppi: int = 300, quality: int = 100, jobs: int = 1) -> int:
+    """
+    Moves every other page of a PDF by rendering the pages to images.
+    With more than one job, pages are rendered, moved and compressed in a
+    process pool. Only a few pages are in flight at once, and each one is
+    written to the output as soon as the pages before it are. Returns the
+    number of pages.
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    page_count = len(pdf)
+    pdf.close()
+
+    offset = OffsetData(x_offset=x_offset, y_offset=y_offset, angle=angle)
+    page_arguments = ((pdf_path, page_index, ppi, quality, offset if page_index % 2 == 1 else None) for page_index in range(page_count))
+
+    # The input is only replaced once the new PDF is complete
+    with PageWriter(output_pdf_path, False, ppi, quality) as pages:
+        def add_page(encoded_page: tuple[bytes, int, int]):
+            pages.add_encoded_page(*encoded_page)
+            print(f'Page {pages.page_count}')
+
+        if jobs <= 1:
+            for arguments in page_arguments:
+                add_page(render_offset_page(*arguments))
         else:
-            offset_images.append(image)
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                in_flight = deque()
+
+                for arguments in page_arguments:
+                    in_flight.append(executor.submit(render_offset_page, *arguments))
 
-        add_offset = not add_offset
+                    if len(in_flight) >= jobs * 2:
+                        add_page(in_flight.popleft().result())
 
-    return offset_images
+                while in_flight:
+                    add_page(in_flight.popleft().result())
+
+    return page_count
+
+image_format_extensions = {
+    ImageFormat.PNG: 'png',
+    ImageFormat.WEBP: 'webp',
+    ImageFormat.TIFF: 'tif'
+}
+
+def get_page_image_filename(page_index: int, image_format: ImageFormat = ImageFormat.PNG) -> str:
+    return f'page{page_index + 1}.{image_format_extensions[ImageFormat(image_format)]}'
+
+def save_page_image(page: Image.Image, path: str, image_format: ImageFormat, compress_level: int, ppi: int):
+    """
+    Saves a page image losslessly. compress_level goes from 0, the fastest
+    with the largest files, to 9, the slowest with the smallest files.
+    """
+    image_format = ImageFormat(image_format)
+
+    if image_format == ImageFormat.WEBP:
+        # Both the method and the quality of lossless WebP set how hard it tries to compress
+        page.save(path, format='WEBP', lossless=True, method=round(compress_level * 6 / 9), quality=round(compress_level * 100 / 9))
+    elif image_format == ImageFormat.TIFF:
+        # Pillow writes TIFF images in strips
+        page.save(path, format='TIFF', compression='tiff_adobe_deflate' if compress_level > 0 else None, dpi=(ppi, ppi))
+    else:
+        page.save(path, format='PNG', compress_level=compress_level, dpi=(ppi, ppi))
+
+class PageWriter:
+    """
+    Writes pages to the output as soon as they are composed, so only the
+    sheet currently being drawn has to be kept in memory.
+
+    With more than one job, pages are compressed by a pool of
+    threads, since Pillow encodes without holding the GIL, while the next
+    sheets are composed. Only a few pages are in flight at once, and PDF
+    pages are still written in their original order.
+
+    Pages of the existing output can be kept with reuse_page. The output is
+    never written in place: the PDF is written next to it and only replaces
+    it once it is complete, and is deleted if the render fails, so a failed
+    render never leaves a partial PDF. Page images replace the previous
+    ones, so files shared with the output cache are left untouched.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        output_images: bool,
+        ppi: int,
+        quality: int,
+        image_format: ImageFormat = ImageFormat.PNG,
+        compress_level: int = 6,
+        jobs: int = 1,
+        subsampling: int = 0
+    ):
+        self.output_path = output_path
+        self.output_images = output_images
+        self.ppi = ppi
+        self.quality = quality
+        self.image_format = image_format
+        self.compress_level = compress_level
+        self.jobs = jobs
+        self.subsampling = subsampling
+
+        self.page_count = 0
+
+        self._pdf = None
+        self._page_refs = []
+
+        self._previous_pdf = None
+        self._write_path = None if output_images else f'{output_path}.tmp'
+
+        self._executor = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        self._in_flight: deque[Future] = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+    def add_page(self, page: Image.Image):
+        page_index = self.page_count
+        self.page_count += 1
+
+        if self._executor is None:
+            self._finish_page(self._encode_page(page, page_index))
+            return
+
+        self._in_flight.append(self._executor.submit(self._encode_page, page, page_index))
+        if len(self._in_flight) >= self.jobs * 2:
+            self._finish_page(self._in_flight.popleft().result())
+
+    def reuse_page(self):
+        """
+        Keeps the page at the same position of the existing output. Images
+        are left in place and the JPEG data of a PDF page is copied as is.
+        """
+        page_index = self.page_count
+        self.page_count += 1
+
+        if self.output_images:
+            return
+
+        if self._previous_pdf is None:
+            self._previous_pdf = PdfParser.PdfParser(filename=self.output_path)
+
+        previous_page = self._previous_pdf.read_indirect(self._previous_pdf.pages[page_index])
+        image = self._previous_pdf.read_indirect(previous_page[b'Resources'][b'XObject'][b'image'])
+        self._add_encoded_page((image.buf, image.dictionary[b'Width'], image.dictionary[b'Height']))
+
+    def add_encoded_page(self, jpeg: bytes, width: int, height: int):
+        # Adds a PDF page that is already compressed as JPEG
+        self.page_count += 1
+        self._add_encoded_page((jpeg, width, height))
+
+    def _add_encoded_page(self, encoded_page: tuple[bytes, int, int]):
+        if self._executor is None:
+            self._finish_page(encoded_page)
+        else:
+            # Wait in line behind the pages that are still being encoded
+            future = Future()
+            future.set_result(encoded_page)
+            self._in_flight.append(future)
+
+    def _encode_page(self, page: Image.Image, page_index: int) -> tuple[bytes, int, int] | None:
+        # Saves a page image, or returns the JPEG data of a PDF page along with its size
+        with profile_stage('encode'):
+            if self.output_images:
+                path = os.path.join(self.output_path, get_page_image_filename(page_index, self.image_format))
+                save_page_image(page, f'{path}.tmp', self.image_format, self.compress_level, self.ppi)
+                os.replace(f'{path}.tmp', path)
+                return None
+
+            page = page.convert('RGB')
+            jpeg = io.BytesIO()
+            page.save(jpeg, format='JPEG', quality=self.quality, subsampling=self.subsampling)
+
+        return jpeg.getvalue(), page.width, page.height
+
+    def _finish_page(self, encoded_page: tuple[bytes, int, int] | None):
+        if encoded_page is not None:
+            self._write_pdf_page(*encoded_page)
+
+    def _write_pdf_page(self, jpeg: bytes, width: int, height: int):
+        if self._pdf is None:
+            self._pdf = PdfParser.PdfParser(filename=self._write_path, mode='w+b')
+            self._pdf.start_writing()
+            self._pdf.write_header()
+
+            # The page tree is written last, once all of its pages are known
+            self._pdf.pages_ref = self._pdf.next_object_id(0)
+
+        image_ref = self._pdf.write_obj(
+            None,
+            stream=jpeg,
+            Type=PdfParser.PdfName('XObject'),
+            Subtype=PdfParser.PdfName('Image'),
+            Width=width,
+            Height=height,
+            Filter=PdfParser.PdfName('DCTDecode'),
+            ColorSpace=PdfParser.PdfName('DeviceRGB'),
+            BitsPerComponent=8
+        )
+
+        page_width = width * 72.0 / self.ppi
+        page_height = height * 72.0 / self.ppi
+        contents_ref = self._pdf.write_obj(None, stream=b'q %f 0 0 %f 0 0 cm /image Do Q\n' % (page_width, page_height))
+
+        page_ref = self._pdf.write_page(
+            None,
+            Resources=PdfParser.PdfDict(
+                ProcSet=[PdfParser.PdfName('PDF'), PdfParser.PdfName('ImageC')],
+                XObject=PdfParser.PdfDict(image=image_ref)
+            ),
+            MediaBox=[0, 0, page_width, page_height],
+            Contents=contents_ref
+        )
+        self._page_refs.append(page_ref)
+
+    def close(self, discard: bool = False):
+        try:
+            if self._executor is not None:
+                try:
+                    # Pages of a failed render are dropped unseen, so their errors don't chain onto the one being raised
+                    while self._in_flight and not discard:
+                        self._finish_page(self._in_flight.popleft().result())
+                finally:
+                    self._in_flight.clear()
+                    self._executor.shutdown(cancel_futures=True)
+                    self._executor = None
+
+            if self._pdf is not None and not discard:
+                self._pdf.write_obj(self._pdf.pages_ref, Type=PdfParser.PdfName('Pages'), Count=len(self._page_refs), Kids=self._page_refs)
+                root_ref = self._pdf.write_obj(None, Type=PdfParser.PdfName('Catalog'), Pages=self._pdf.pages_ref)
+                self._pdf.write_xref_and_trailer(root_ref)
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            if self._pdf is not None:
+                self._pdf.close()
+                self._pdf = None
+
+            if self._previous_pdf is not None:
+                self._previous_pdf.close()
+                self._previous_pdf = None
+
+            if self._write_path is not None and os.path.exists(self._write_path):
+                if discard:
+                    # Keep the existing output, if any, rather than an incomplete one
+                    os.remove(self._write_path)
+                else:
+                    os.replace(self._write_path, self.output_path)
+
+def insert_pdf_text(pdf: pdfium.PdfDocument, page: pdfium.PdfPage, label: str, font_size: float, x: float, y: float, anchor: str, fill: str = 'black'):
+    """
+    Inserts a line of Helvetica text at x and y, in points from the bottom
+    left of the page. Like Pillow anchors, "ra" places the top right corner
+    of the text there and "mm" places its middle there.
+    """
+    text = pdfium_c.FPDFPageObj_NewTextObj(pdf, b'Helvetica', font_size)
+
+    text_buffer = ctypes.create_string_buffer((label + '\x00').encode('utf-16-le'))
+    pdfium_c.FPDFText_SetText(text, ctypes.cast(text_buffer, pdfium_c.FPDF_WIDESTRING))
+    pdfium_c.FPDFPageObj_SetFillColor(text, *ImageColor.getrgb(fill), 255)
+
+    left, bottom, right, top = (ctypes.c_float() for _ in range(4))
+    pdfium_c.FPDFPageObj_GetBounds(text, left, bottom, right, top)
+
+    if anchor == 'ra':
+        x -= right.value - left.value
+        y -= top.value
+    else:
+        x -= (left.value + right.value) / 2
+        y -= (bottom.value + top.value) / 2
+
+    pdfium_c.FPDFPageObj_Transform(text, 1, 0, 0, 1, x, y)
+    pdfium_c.FPDFPage_InsertObject(page, text)
+
+class DirectCard(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # The JPEG data of the card, after crop and corner trim
+    jpeg: bytes
+
+    # The 1 pixel edges and corners of the card, stretched to create print bleed
+    edges: Dict[str, Image.Image]
+
+class DirectPdfWriter:
+    """
+    Assembles the PDF directly from the card images instead of rasterizing
+    whole sheets. Each card is its own image object placed at its layout
+    position, and the registration marks and the print bleed strips are
+    separate objects, so the output does not depend on the page PPI.
+
+    JPEG card images that need no crop, EXIF rotation or corner trim are
+    embedded as is, without being compressed again, unless they're much
+    larger than their slot at the PPI of the sheet layout. Those are scaled
+    down to the PPI first. Backs are rotated with the placement matrix
+    rather than the pixels.
+
+    Pages of the existing output can be kept with reuse_page. The PDF is
+    saved next to the output and only replaces it once it is complete, so
+    the output is never written in place or left partially written.
+    """
+
+    # Positions in layouts.json are in pixels at 300 PPI
+    points_per_pixel = 72 / 300
+
+    def __init__(self, output_path: str, sheet_layout: SheetLayout, quality: int):
+        self.output_path = output_path
+        self.sheet_layout = sheet_layout
+        self.quality = quality
+
+        self.page_count = 0
+
+        self.pdf = pdfium.PdfDocument.new()
+
+        self._previous_pdf = None
+        self._save_path = f'{output_path}.tmp'
+
+        with Image.open(sheet_layout.registration_path) as reg_im:
+            self.page_width = reg_im.width
+            self.page_height = reg_im.height
+
+        # Templates are drawn in their own documents and kept open until the PDF is saved
+        self._templates: List[tuple[pdfium.PdfDocument, pdfium.PdfPage, pdfium.PdfXObject]] = []
+
+        # The registration marks are shared by every page
+        self.registration = self._create_template(lambda doc, page: self._add_image(doc, page, sheet_layout.registration_path, (0, 0, self.page_width, self.page_height)))
+
+        # Recently used cards, so that duplicates are only prepared once
+        self._cards: OrderedDict[tuple, DirectCard] = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+    def _create_template(self, draw: Callable[[pdfium.PdfDocument, pdfium.PdfPage], None]) -> pdfium.PdfXObject:
+        doc = pdfium.PdfDocument.new()
+        page = doc.new_page(self.page_width * self.points_per_pixel, self.page_height * self.points_per_pixel)
+        draw(doc, page)
+        page.gen_content()
+
+        template = doc.page_as_xobject(0, self.pdf)
+        self._templates.append((doc, page, template))
+        return template
+
+    def _get_matrix(self, box: tuple[float, float, float, float], flip: bool = False) -> pdfium.PdfMatrix:
+        # Convert a box in pixels from the top left to points from the bottom left
+        x, y, width, height = box
+        x = x * self.points_per_pixel
+        y = (self.page_height - y - height) * self.points_per_pixel
+        width = width * self.points_per_pixel
+        height = height * self.points_per_pixel
+
+        if flip:
+            return pdfium.PdfMatrix(-width, 0, 0, -height, x + width, y + height)
+
+        return pdfium.PdfMatrix(width, 0, 0, height, x, y)
+
+    def _add_image(self, pdf: pdfium.PdfDocument, page: pdfium.PdfPage, source: str | bytes | Image.Image, box: tuple[float, float, float, float], flip: bool = False):
+        if box[2] <= 0 or box[3] <= 0:
+            return
+
+        image = pdfium.PdfImage.new(pdf)
+        if isinstance(source, Image.Image):
+            image.set_bitmap(pdfium.PdfBitmap.from_pil(source))
+        elif isinstance(source, bytes):
+            image.load_jpeg(io.BytesIO(source), inline=True)
+        else:
+            image.load_jpeg(source, inline=True)
+
+        image.set_matrix(self._get_matrix(box, flip))
+        page.insert_obj(image)
+
+    @profiled('prepare card')
+    def _prepare_card(self, image_path: str, crop: tuple[float, float]) -> DirectCard:
+        key = (hash_file(image_path), crop)
+        if key in self._cards:
+            self._cards.move_to_end(key)
+            return self._cards[key]
+
+        with Image.open(image_path) as card_image:
+            orientation = card_image.getexif().get(ExifTags.Base.Orientation, 1)
+            passthrough = card_image.format == 'JPEG' and card_image.mode in ('RGB', 'L') and orientation == 1 and crop == (0, 0) and self.sheet_layout.extend_corners == 0
+
+            card_image = ImageOps.exif_transpose(card_image)
+
+            # Crop the outer portion of a card to remove preexisting print bleed
+            crop_x_percent, crop_y_percent = crop
+            if crop_x_percent > 0 or crop_y_percent > 0:
+                card_width, card_height = card_image.size
+                card_width_crop = math.floor(card_width / 2 * (crop_x_percent / 100))
+                card_height_crop = math.floor(card_height / 2 * (crop_y_percent / 100))
+
+                card_image = card_image.crop((
+                    card_width_crop,
+                    card_height_crop,
+                    card_width - card_width_crop,
+                    card_height - card_height_crop
+                ))
+
+            # Trim the corners at the native resolution of the image
+            extend_corners = self.sheet_layout.extend_corners
+            if extend_corners > 0:
+                extend_corners_x = math.floor(extend_corners * card_image.width / self.sheet_layout.width)
+                extend_corners_y = math.floor(extend_corners * card_image.height / self.sheet_layout.height)
+                card_image = card_image.crop((extend_corners_x, extend_corners_y, card_image.width - extend_corners_x, card_image.height - extend_corners_y))
+
+            card_image = card_image.convert('RGB')
+
+            # Images far larger than their slot at the PPI would only make the PDF bigger
+            slot_width = max(math.floor((self.sheet_layout.width - 2 * extend_corners) * self.sheet_layout.ppi_ratio), 1)
+            slot_height = max(math.floor((self.sheet_layout.height - 2 * extend_corners) * self.sheet_layout.ppi_ratio), 1)
+            if card_image.width > slot_width * max_direct_image_scale or card_image.height > slot_height * max_direct_image_scale:
+                settings = render_presets[self.sheet_layout.preset]
+                card_image = card_image.resize((slot_width, slot_height), settings.resample, reducing_gap=settings.reducing_gap)
+                passthrough = False
+
+            if passthrough:
+                with open(image_path, 'rb') as image_file:
+                    jpeg = image_file.read()
+            else:
+                jpeg_buffer = io.BytesIO()
+                card_image.save(jpeg_buffer, format='JPEG', quality=self.quality, subsampling=render_presets[self.sheet_layout.preset].subsampling)
+                jpeg = jpeg_buffer.getvalue()
+
+            width, height = card_image.size
+            edges = {
+                'top': card_image.crop((0, 0, width, 1)),
+                'bottom': card_image.crop((0, height - 1, width, height)),
+                'left': card_image.crop((0, 0, 1, height)),
+                'right': card_image.crop((width - 1, 0, width, height)),
+                'top_left': card_image.crop((0, 0, 1, 1)),
+                'top_right': card_image.crop((width - 1, 0, width, 1)),
+                'bottom_left': card_image.crop((0, height - 1, 1, height)),
+                'bottom_right': card_image.crop((width - 1, height - 1, width, height))
+            }
+
+        card = DirectCard(jpeg=jpeg, edges=edges)
+
+        self._cards[key] = card
+        if len(self._cards) > 16:
+            self._cards.popitem(last=False)
+
+        return card
+
+    def _draw_cards(self, pdf: pdfium.PdfDocument, page: pdfium.PdfPage, image_paths: List[str | None], crop: tuple[float, float], flip: bool):
+        layout = self.sheet_layout
+        num_cards = layout.num_rows * layout.num_cols
+
+        for i, image_path in enumerate(image_paths):
+            if image_path is None:
+                continue
+
+            # Calculate the location of the new card based on what number the card is
+            origin_x = layout.x_pos[i % num_cards % layout.num_cols]
+            origin_y = layout.y_pos[(i % num_cards) // layout.num_cols]
+
+            if flip:
+                origin_y = layout.y_pos[layout.num_rows - ((i % num_cards) // layout.num_cols) - 1]
+
+            with profile_stage('card', image_path):
+                card = self._prepare_card(image_path, crop)
+
+            x = origin_x + layout.extend_corners
+            y = origin_y + layout.extend_corners
+            width = layout.width - 2 * layout.extend_corners
+            height = layout.height - 2 * layout.extend_corners
+
+            self._add_image(pdf, page, card.jpeg, (x, y, width, height), flip)
+
+            # Only extend the edges as far as the page allows
+            x_bleed, y_bleed = (bleed + layout.extend_corners for bleed in layout.print_bleed)
+            left_bleed = max(0, min(x_bleed, x))
+            right_bleed = max(0, min(x_bleed, self.page_width - x - width))
+            top_bleed = max(0, min(y_bleed, y))
+            bottom_bleed = max(0, min(y_bleed, self.page_height - y - height))
+
+            edges = card.edges
+            if flip:
+                # The edges of a rotated card swap places and are rotated as well
+                edges = {
+                    position: edges[opposite].transpose(Image.Transpose.ROTATE_180)
+                    for position, opposite in [
+                        ('top', 'bottom'), ('bottom', 'top'), ('left', 'right'), ('right', 'left'),
+                        ('top_left', 'bottom_right'), ('top_right', 'bottom_left'), ('bottom_left', 'top_right'), ('bottom_right', 'top_left')
+                    ]
+                }
+
+            self._add_image(pdf, page, edges['top'], (x, y - top_bleed, width, top_bleed))
+            self._add_image(pdf, page, edges['bottom'], (x, y + height, width, bottom_bleed))
+            self._add_image(pdf, page, edges['left'], (x - left_bleed, y, left_bleed, height))
+            self._add_image(pdf, page, edges['right'], (x + width, y, right_bleed, height))
+            self._add_image(pdf, page, edges['top_left'], (x - left_bleed, y - top_bleed, left_bleed, top_bleed))
+            self._add_image(pdf, page, edges['top_right'], (x + width, y - top_bleed, right_bleed, top_bleed))
+            self._add_image(pdf, page, edges['bottom_left'], (x - left_bleed, y + height, left_bleed, bottom_bleed))
+            self._add_image(pdf, page, edges['bottom_right'], (x + width, y + height, right_bleed, bottom_bleed))
+
+    @profiled('label')
+    def _draw_label(self, page: pdfium.PdfPage, label: str, position: tuple[int, int]):
+        # Anchor the label by its top right corner, like the raster label
+        x, y = position
+        insert_pdf_text(self.pdf, page, label, 40 * self.points_per_pixel, x * self.points_per_pixel, (self.page_height - y) * self.points_per_pixel, 'ra')
+
+    def create_template(self, image_paths: List[str | None], crop: tuple[float, float], flip: bool) -> pdfium.PdfXObject:
+        """
+        Draws cards once so that they can be shared by several pages, such as
+        the card backs of single-sided sheets.
+        """
+        return self._create_template(lambda doc, page: self._draw_cards(doc, page, image_paths, crop, flip))
+
+    @profiled('page')
+    def add_page(self, image_paths: List[str | None] | None = None, crop: tuple[float, float] = (0, 0), flip: bool = False, template: pdfium.PdfXObject | None = None, label: str | None = None, label_position: tuple[int, int] | None = None, back: bool = False):
+        page = self.pdf.new_page(self.page_width * self.points_per_pixel, self.page_height * self.points_per_pixel)
+        page.insert_obj(self.registration.as_pageobject())
+
+        if template is not None:
+            page.insert_obj(template.as_pageobject())
+
+        if image_paths is not None:
+            self._draw_cards(self.pdf, page, image_paths, crop, flip)
+
+        if label is not None:
+            self._draw_label(page, label, label_position)
+
+        # Back pages are moved by the saved offset, rotating around the center of the page
+        offset = self.sheet_layout.offset
+        if back and offset is not None:
+            with profile_stage('offset'):
+                matrix = get_offset_matrix(offset.x_offset, offset.y_offset, offset.angle, (0, 0, self.page_width * self.points_per_pixel, self.page_height * self.points_per_pixel))
+                for page_object in page.get_objects(max_depth=0):
+                    page_object.transform(matrix)
+
+        page.gen_content()
+        page.close()
+
+        self.page_count += 1
+
+    def reuse_page(self):
+        # Keeps the page at the same position of the existing output
+        if self._previous_pdf is None:
+            self._previous_pdf = pdfium.PdfDocument(self.output_path)
+
+        self.pdf.import_pages(self._previous_pdf, [self.page_count])
+        self.page_count += 1
+
+    def close(self, discard: bool = False):
+        try:
+            if self.page_count > 0 and not discard:
+                with profile_stage('save'):
+                    self.pdf.save(self._save_path)
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            for doc, page, template in self._templates:
+                template.close()
+                page.close()
+                doc.close()
+
+            self.pdf.close()
+
+            # Imported pages may be read from the existing output until the new PDF is saved
+            if self._previous_pdf is not None:
+                self._previous_pdf.close()
+
+            if os.path.exists(self._save_path):
+                if discard:
+                    os.remove(self._save_path)
+                else:
+                    os.replace(self._save_path, self.output_path)
 
 def calculate_max_print_bleed(x_pos: List[int], y_pos: List[int], width: int, height: int) -> tuple[int, int]:
     if len(x_pos) == 1 & len(y_pos) == 1: